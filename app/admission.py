@@ -0,0 +1,169 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from perf.metrics import metrics
+
+ADMISSION_ACTIVE = metrics.gauge(
+    'riskread_admission_active', 'Requests currently holding a slot in an admission lane', ['lane'])
+ADMISSION_QUEUE_DEPTH = metrics.gauge(
+    'riskread_admission_queue_depth', 'Requests waiting for a slot in an admission lane', ['lane'])
+ADMISSION_REJECTED_TOTAL = metrics.counter(
+    'riskread_admission_rejected_total', 'Requests turned away before any work was done', ['lane', 'reason'])
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    'riskread_admission_wait_seconds', 'Time spent queued before admission', ['lane'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+
+class Rejected(Exception):
+    """A request was not admitted; status is 503 (saturated) or 429 (rate limited)"""
+
+    def __init__(self, lane, reason, retry_after, status=503):
+        super().__init__(f"{lane} lane {reason.replace('_', ' ')}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status = status
+
+
+class Lane:
+    """At most max_concurrent requests at a time, at most max_waiting queued behind them
+
+    A request that finds every slot taken waits up to max_wait seconds;
+    one that finds the queue full is rejected immediately, so a burst
+    costs the server max_concurrent + max_waiting threads and no more.
+    max_concurrent=0 makes the lane unlimited.
+    """
+
+    def __init__(self, name, max_concurrent, max_waiting=0, max_wait=10.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        # Moving average of how long a request holds a slot, for Retry-After
+        self.hold_seconds = 1.0
+        self._slots = threading.Semaphore(max_concurrent or 1)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot, queueing if allowed; raises Rejected when saturated"""
+        if not self.max_concurrent:
+            return
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                queue_full = self.waiting >= self.max_waiting
+                if not queue_full:
+                    self.waiting += 1
+                    ADMISSION_QUEUE_DEPTH.set(self.waiting, lane=self.name)
+            if queue_full:
+                self._reject('queue_full')
+            acquired = self._slots.acquire(timeout=self.max_wait)
+            with self._lock:
+                self.waiting -= 1
+                ADMISSION_QUEUE_DEPTH.set(self.waiting, lane=self.name)
+            if not acquired:
+                self._reject('queue_timeout')
+        with self._lock:
+            self.active += 1
+            ADMISSION_ACTIVE.set(self.active, lane=self.name)
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, lane=self.name)
+
+    def release(self, held_seconds):
+        if not self.max_concurrent:
+            return
+        with self._lock:
+            self.active -= 1
+            self.hold_seconds += 0.2 * (held_seconds - self.hold_seconds)
+            ADMISSION_ACTIVE.set(self.active, lane=self.name)
+        self._slots.release()
+
+    def retry_after(self):
+        """Whole seconds until the queue ahead of a new request has likely drained"""
+        return max(1, math.ceil(self.hold_seconds * (self.waiting + 1) / self.max_concurrent))
+
+    def _reject(self, reason):
+        ADMISSION_REJECTED_TOTAL.inc(lane=self.name, reason=reason)
+        raise Rejected(self.name, reason, self.retry_after())
+
+
+class RateLimiter:
+    """Per-client token buckets: rate requests/second sustained, bursts of up to burst
+
+    Buckets for the least recently seen clients are dropped beyond
+    max_clients; a dropped client simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()     # client -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """0 if client may proceed (one token taken), else seconds until it may"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class Admission:
+    """Admission control for the analysis endpoints
+
+    Requests that need OCR and cheap text requests (text analyses,
+    /api/predict) are admitted through separate lanes, so a burst of
+    uploads stuck in tesseract can fill the OCR lane but never delays
+    text work. Defaults can be overridden with RISKREAD_OCR_CONCURRENCY,
+    RISKREAD_OCR_QUEUE, RISKREAD_OCR_QUEUE_TIMEOUT and the matching
+    RISKREAD_TEXT_* variables. RISKREAD_RATE_LIMIT (requests/second per
+    client, default 0 = off) and RISKREAD_RATE_BURST enable per-client
+    token buckets in front of both lanes.
+    """
+
+    def __init__(self):
+        env = os.environ.get
+        self.lanes = {
+            'ocr': Lane('ocr',
+                        max_concurrent=int(env('RISKREAD_OCR_CONCURRENCY', max(1, (os.cpu_count() or 2) // 2))),
+                        max_waiting=int(env('RISKREAD_OCR_QUEUE', 8)),
+                        max_wait=float(env('RISKREAD_OCR_QUEUE_TIMEOUT', 10))),
+            'text': Lane('text',
+                         max_concurrent=int(env('RISKREAD_TEXT_CONCURRENCY', 16)),
+                         max_waiting=int(env('RISKREAD_TEXT_QUEUE', 64)),
+                         max_wait=float(env('RISKREAD_TEXT_QUEUE_TIMEOUT', 5))),
+        }
+        rate = float(env('RISKREAD_RATE_LIMIT', 0))
+        self.rate_limiter = RateLimiter(rate, float(env('RISKREAD_RATE_BURST', 10))) if rate > 0 else None
+
+    def admit(self, lane, client=None):
+        """Admit a request into lane; returns a ticket for release() or raises Rejected"""
+        if self.rate_limiter and client:
+            wait = self.rate_limiter.take(client)
+            if wait:
+                ADMISSION_REJECTED_TOTAL.inc(lane=lane, reason='rate_limited')
+                raise Rejected(lane, 'rate_limited', max(1, math.ceil(wait)), status=429)
+        self.lanes[lane].acquire()
+        return (lane, time.perf_counter())
+
+    def release(self, ticket):
+        lane, admitted_at = ticket
+        self.lanes[lane].release(time.perf_counter() - admitted_at)
+
+
+# Create a global instance
+admission = Admission()
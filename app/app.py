@@ -1,18 +1,31 @@
-from flask import Flask, render_template, request, jsonify, flash
+from flask import Flask, render_template, request, jsonify, flash, g, Response, send_file, stream_with_context, url_for
 import os
+import json
 import sys
+import time
 import base64
-from PIL import Image
 import io
+import secrets
 from werkzeug.utils import secure_filename
 
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ocr.ocr_engine import ocr_engine
-from nlp.ingredient_extractor import ingredient_extractor
-from nlp.post_processor import post_processor
+from ocr.dedup import upload_index
 from ml.predict import classifier
+from perf.deadline import Deadline
+from perf.lazy import lazy_import
+from perf.cache import TTLCache
+from perf.memory import REQUEST_PEAK_RSS_BYTES, rss_tracker
+from perf.metrics import metrics
+from perf.profiling import profiler
+from app.pipeline import analyze_ocr_result, analyze_text, canonical_text, compute_stats, stream_image_analysis
+from app.admission import Rejected, admission
+from app.live import StaleRevision, live_analyzer
+from app.warmup import readiness, start_warm_up, warm_up
+
+Image = lazy_import('PIL.Image')
 
 app = Flask(__name__)
 app.secret_key = 'riskread-secret-key-2024'
@@ -21,13 +34,142 @@ app.secret_key = 'riskread-secret-key-2024'
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp', 'tiff'}
 MAX_CONTENT_LENGTH = 64 * 1024 * 1024  # 64MB max file size
+ANALYZE_TIME_BUDGET = float(os.environ.get('RISKREAD_ANALYZE_TIME_BUDGET', 30))  # seconds per analyze call
+TEXT_CACHE_SIZE = int(os.environ.get('RISKREAD_TEXT_CACHE_SIZE', 1024))  # 0 disables the text result cache
+TEXT_CACHE_TTL = float(os.environ.get('RISKREAD_TEXT_CACHE_TTL', 3600))  # seconds
+STREAM_REPORT_TTL = float(os.environ.get('RISKREAD_STREAM_REPORT_TTL', 600))  # seconds a streamed result stays viewable
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['ANALYZE_TIME_BUDGET'] = ANALYZE_TIME_BUDGET
 
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Analyses of pasted label text, keyed by canonical text and classifier generation
+text_result_cache = TTLCache('text_results', max_entries=TEXT_CACHE_SIZE, ttl=TEXT_CACHE_TTL)
+
+# Finished /analyze/stream results, keyed by the result_id of their "done" event
+stream_reports = TTLCache('stream_reports', max_entries=256, ttl=STREAM_REPORT_TTL)
+
+# Metrics
+REQUESTS_TOTAL = metrics.counter(
+    'riskread_requests_total', 'HTTP requests handled', ['endpoint', 'method', 'status'])
+REQUEST_ERRORS_TOTAL = metrics.counter(
+    'riskread_request_errors_total', 'Requests that ended in an unhandled pipeline error', ['endpoint'])
+REQUEST_SECONDS = metrics.histogram(
+    'riskread_request_seconds', 'End-to-end request latency', ['endpoint'])
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    'riskread_requests_in_flight', 'Requests currently being processed (queue depth)')
+STAGE_SECONDS = metrics.histogram(
+    'riskread_stage_seconds', 'Latency of one pipeline stage', ['stage'])
+ANALYSES_TOTAL = metrics.counter(
+    'riskread_analyses_total', 'Completed analyses by input source', ['source'])
+GIBBERISH_TOTAL = metrics.counter(
+    'riskread_gibberish_rejections_total', 'Image analyses rejected because OCR text looked like gibberish')
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    g.rss_token = rss_tracker.start()
+    REQUESTS_IN_FLIGHT.inc()
+
+@app.teardown_request
+def _finish_request_timer(exc=None):
+    if 'request_start' in g:
+        REQUESTS_IN_FLIGHT.dec()
+    token = g.pop('rss_token', None)
+    if token:
+        # Runs after streamed responses have finished, so their OCR counts too
+        REQUEST_PEAK_RSS_BYTES.observe(rss_tracker.finish(token), endpoint=request.endpoint or 'unknown')
+
+def admission_lane():
+    """'ocr' for analyses that carry an image, 'text' for other analyses and predictions, None otherwise"""
+    if request.endpoint in ('api_predict', 'api_analyze_live'):
+        return 'text'
+    if request.endpoint == 'analyze':
+        # /analyze runs OCR on any attached image, even when text is also given
+        upload = request.files.get('image')
+        has_image = len(request.form.get('image_data', '').strip()) > 100 or bool(upload and upload.filename)
+    elif request.endpoint in ('api_analyze', 'analyze_stream'):
+        if request.is_json:
+            data = request.get_json(silent=True)
+            has_image = isinstance(data, dict) and bool(data.get('image')) and \
+                not (data.get('text') or data.get('ingredients'))
+        elif request.form or request.files:
+            upload = request.files.get('image')
+            text = request.form.get('ingredients') or request.form.get('text') or ''
+            has_image = (bool(upload and upload.filename) or bool(request.form.get('image_data'))) \
+                and not text.strip()
+        else:
+            has_image = request.mimetype != 'text/plain'
+    else:
+        return None
+    return 'ocr' if has_image else 'text'
+
+@app.before_request
+def _admit_request():
+    lane = admission_lane()
+    if lane is None:
+        return None
+    try:
+        g.admission = admission.admit(lane, request.remote_addr)
+    except Rejected as rejection:
+        print(f"🚦 Rejected {request.path} ({rejection}), retry after {rejection.retry_after}s")
+        headers = {'Retry-After': str(rejection.retry_after)}
+        if request.path.startswith('/api/'):
+            return jsonify({'error': str(rejection), 'retry_after': rejection.retry_after}), \
+                rejection.status, headers
+        flash(f"⏳ RiskRead is busy reading other labels. Please try again in {rejection.retry_after} seconds.", "error")
+        return render_template('index.html'), rejection.status, headers
+
+@app.teardown_request
+def _release_admission(exc=None):
+    ticket = g.pop('admission', None)
+    if ticket:
+        admission.release(ticket)
+
+@app.after_request
+def _record_request_metrics(response):
+    if 'request_start' in g:
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+def profiling_requested():
+    """True if this is an /analyze or /api/* request carrying the profiling token"""
+    if not profiler.enabled or request.endpoint in (None, 'download_profile', 'analyze_stream'):
+        return False
+    if request.path != '/analyze' and not request.path.startswith('/api/'):
+        return False
+    return profiler.authorized(request.headers.get(profiler.HEADER) or request.args.get(profiler.QUERY_PARAM))
+
+@app.before_request
+def _start_profile():
+    # Registered after admission: time spent queued for a slot is not profiled
+    if profiling_requested():
+        g.profile = profiler.begin(request.method, request.path, request.endpoint)
+        g.profile_busy = g.profile is None
+
+@app.after_request
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile:
+        profiler.end(profile, response.status_code)
+        response.headers[profiler.HEADER] = profile.id
+        response.headers[f"{profiler.HEADER}-Url"] = url_for('download_profile', profile_id=profile.id)
+    elif g.pop('profile_busy', False):
+        response.headers[profiler.HEADER] = 'busy'
+    return response
+
+@app.teardown_request
+def _abandon_profile(exc=None):
+    # The view raised: still stop profiling (and free the profiler for the next request)
+    profile = g.pop('profile', None)
+    if profile:
+        profiler.end(profile, 500)
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -53,6 +195,26 @@ def save_base64_image(base64_data, filename="pasted_image.png"):
         print(f"❌ Error saving base64 image: {e}")
         return None
 
+def ocr_upload(filepath, deadline):
+    """OCR a saved upload unless the same image was uploaded before
+    
+    Returns (ocr_result, ocr_seconds, fingerprint, cached): cached is the
+    stored analysis of the earlier upload on a duplicate hit. Multi-page
+    files are read page by page and merged (see OCREngine.extract_text_detailed).
+    """
+    fingerprint = upload_index.fingerprint(filepath)
+    cached = upload_index.lookup(fingerprint, classifier.generation)
+    if cached:
+        print(f"  ♻️ Same image as an earlier upload, reusing its {len(cached['ingredients'])} ingredients")
+        return cached['ocr_result'], 0.0, fingerprint, cached
+    
+    start = time.perf_counter()
+    with profiler.stage('ocr'):
+        ocr_result = ocr_engine.extract_text_detailed(filepath, deadline=deadline)
+    for page in ocr_result.get('pages', []):
+        print(f"  📄 Page {page['page'] + 1}: {page['text'][:80]}...")
+    return ocr_result, time.perf_counter() - start, fingerprint, None
+
 @app.route('/', methods=['GET'])
 def index():
     """Render the main page"""
@@ -82,8 +244,13 @@ def analyze():
     
     try:
         results = []
+        deadline = Deadline(app.config['ANALYZE_TIME_BUDGET'])
         source_type = "text"
         extracted_text = ""
+        ocr_result = None
+        ocr_seconds = 0.0
+        fingerprint = None
+        cached = None
         filepath = None
         
         # ===== CHECK 1: PASTED IMAGE (base64 data) =====
@@ -102,7 +269,8 @@ def analyze():
                 # Extract text using OCR
                 print(f"  Starting OCR extraction...")
                 try:
-                    extracted_text = ocr_engine.extract_text(filepath)
+                    ocr_result, ocr_seconds, fingerprint, cached = ocr_upload(filepath, deadline)
+                    extracted_text = ocr_engine.format_result(ocr_result)
                     print(f"  OCR Result: {extracted_text[:200]}...")
                     
                     if not extracted_text or not extracted_text.strip() or "No text detected" in extracted_text:
@@ -139,7 +307,8 @@ def analyze():
                         # Extract text using OCR
                         print(f"  Starting OCR extraction...")
                         try:
-                            extracted_text = ocr_engine.extract_text(filepath)
+                            ocr_result, ocr_seconds, fingerprint, cached = ocr_upload(filepath, deadline)
+                            extracted_text = ocr_engine.format_result(ocr_result)
                             print(f"  OCR Result: {extracted_text[:200]}...")
                             
                             if not extracted_text or not extracted_text.strip() or "No text detected" in extracted_text:
@@ -167,6 +336,18 @@ def analyze():
             extracted_text = text_input
             source_type = "text"
             print(f"  ✅ Using text input")
+        elif ocr_result and ocr_result.get('rejected'):
+            # The quality gate rejected the image before OCR ran
+            print(f"  🛑 Image rejected by quality gate: {ocr_result['rejected']}")
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
+            return render_template('result.html',
+                                  predictions=None,
+                                  stats=None,
+                                  source_type=source_type,
+                                  original_text=extracted_text,
+                                  gibberish_detected=False,
+                                  quality_reason=ocr_result['rejected'])
         elif extracted_text and extracted_text.strip() and extracted_text != "OCR failed":
             # Use OCR result if available
             print(f"  ✅ Using OCR result")
@@ -179,53 +360,26 @@ def analyze():
         print(f"\n📊 DEBUG: Source type: {source_type}")
         print(f"DEBUG: Text to process: {extracted_text[:200]}...")
         
-        # ===== PROCESS INGREDIENTS =====
-        # Extract ingredients from text
-        if source_type == "image":
-            ingredients = ingredient_extractor.extract_from_ocr(extracted_text)
-            print(f"  Extracted {len(ingredients)} ingredients from {source_type}")
+        # ===== ANALYZE: extraction, post-processing, fallbacks, predictions =====
+        # Repeated label text and duplicate uploads reuse earlier analyses
+        if source_type == "text":
+            analysis, _ = analyze_text_cached(extracted_text)
+        elif cached is not None:
+            analysis = dict(cached, timings={})
         else:
-            ingredients = ingredient_extractor.extract_ingredients(extracted_text)
-            print(f"  Extracted {len(ingredients)} ingredients from text")
-        
-        print(f"  Raw ingredients: {ingredients}")
-        
-        # Apply post-processing
-        if ingredients:
-            try:
-                ingredients = post_processor.clean_ingredient_list(ingredients)
-                print(f"  Cleaned ingredients: {ingredients}")
-            except Exception as e:
-                print(f"  ⚠️ Post-processor failed: {e}, using raw ingredients")
+            generation = classifier.generation
+            analysis = analyze_ocr_result(ocr_result, ocr_seconds)
+            remember_upload(fingerprint, ocr_result, analysis, generation)
+        record_stage_seconds(analysis)
+        ingredients = analysis['ingredients']
+        predictions = analysis['predictions']
+        print(f"  Ingredients: {ingredients}")
+        print(f"  Made {len(predictions)} predictions")
         
-        gibberish_detected = False
         if not ingredients:
             print("  ⚠️ WARNING: No ingredients extracted!")
-            # Check if it was rejected as gibberish (i.e., we had text but got 0 ingredients)
-            if source_type == "image" and extracted_text and len(extracted_text) > 10:
-                # If the extractor rejected it (returned []), it likely detected gibberish.
-                print("  🛑 Skipping emergency extraction (likely gibberish).")
-                gibberish_detected = True
-            else:
-                # Only try emergency extraction for TEXT input or if OCR gave something vaguely plausible but we failed to parse it
-                print("  Trying emergency extraction...")
-                emergency_ingredients = []
-                for part in extracted_text.split(','):
-                    part = part.strip()
-                    if part and len(part) > 3:
-                        for prefix in ['made of:', 'contains:', 'ingredients:', 'less than']:
-                            if part.lower().startswith(prefix):
-                                part = part[len(prefix):].strip()
-                        if len(part) < 20 and len(re.findall(r'[aeiou]', part.lower())) == 0:
-                            continue # Skip parts with no vowels
-                        if part:
-                            emergency_ingredients.append(part)
-                if emergency_ingredients:
-                    ingredients = emergency_ingredients
-                    print(f"  ✅ Emergency extraction found: {ingredients}")
-
-        if not ingredients:
-            if gibberish_detected:
+            if analysis['gibberish']:
+                GIBBERISH_TOTAL.inc()
                 return render_template('result.html',
                                       predictions=None,
                                       stats=None,
@@ -236,20 +390,11 @@ def analyze():
                 flash("❌ No valid ingredients found. The image quality might be too low or the text is unreadable.", "error")
                 return render_template('index.html')
         
-        # ===== MAKE PREDICTIONS =====
-        print(f"\n🤖 DEBUG: Making predictions...")
-        predictions = classifier.predict_multiple(ingredients)
-        print(f"  Made {len(predictions)} predictions")
-        
         # Calculate statistics
-        stats = {
-            'total': len(predictions),
-            'harmful': sum(1 for p in predictions if p['label'] == 'Harmful'),
-            'controversial': sum(1 for p in predictions if p['label'] == 'Controversial'),
-            'safe': sum(1 for p in predictions if p['label'] == 'Not Harmful')
-        }
+        stats = compute_stats(predictions)
         
         print(f"  Stats: {stats}")
+        ANALYSES_TOTAL.inc(source=source_type)
         
         # Clean up temporary file
         if filepath and os.path.exists(filepath):
@@ -267,10 +412,12 @@ def analyze():
                      stats=stats,
                      source_type=source_type,
                      original_text=extracted_text[:500],
-                     gibberish_detected=False)
+                     gibberish_detected=False,
+                     ocr_partial=source_type == "image" and bool(ocr_result and ocr_result['partial']))
         
     except Exception as e:
         print(f"\n❌ ERROR in /analyze: {str(e)}")
+        REQUEST_ERRORS_TOTAL.inc(endpoint='analyze')
         import traceback
         traceback.print_exc()
         flash(f"❌ An error occurred: {str(e)}", "error")
@@ -286,7 +433,8 @@ def api_predict():
     if not ingredient:
         return jsonify({'error': 'No ingredient provided'}), 400
     
-    label, explanation = classifier.predict_ingredient(ingredient)
+    with profiler.stage('ml'):
+        label, explanation = classifier.predict_ingredient(ingredient)
     
     return jsonify({
         'ingredient': ingredient,
@@ -294,11 +442,318 @@ def api_predict():
         'explanation': explanation
     })
 
+def read_api_input():
+    """(text, image_bytes) from a JSON, multipart/form or raw image request body
+    
+    JSON bodies use "text" or "image" (base64); forms use the same fields
+    as /analyze ("ingredients", an "image" file or base64 "image_data"); any other body is taken
+    as the image itself (text/plain as label text). Text wins when both
+    are given, as on /analyze. Raises ValueError for unusable input.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ValueError("JSON body must be an object")
+        text = data.get('text') or data.get('ingredients')
+        image = data.get('image')
+        if text:
+            return str(text), None
+        if image:
+            try:
+                return None, base64.b64decode(image, validate=True)
+            except (TypeError, ValueError):
+                raise ValueError("image must be base64-encoded")
+        raise ValueError("Provide 'text' or 'image'")
+    
+    if request.form or request.files:
+        text = request.form.get('ingredients') or request.form.get('text')
+        if text and text.strip():
+            return text, None
+        file = request.files.get('image')
+        if file and file.filename:
+            if not allowed_file(file.filename):
+                raise ValueError(f"Unsupported file type: {file.filename}")
+            return None, file.read()
+        image_data = request.form.get('image_data', '').strip()
+        if image_data:
+            try:
+                return None, base64.b64decode(image_data, validate=True)
+            except ValueError:
+                raise ValueError("image_data must be base64-encoded")
+        raise ValueError("Provide an 'ingredients' field or an 'image' file")
+    
+    body = request.get_data()
+    if not body:
+        raise ValueError("Empty request body")
+    if request.mimetype == 'text/plain':
+        return body.decode('utf-8', errors='replace'), None
+    return None, body
+
+def record_stage_seconds(analysis):
+    """Observe the per-stage timings of a pipeline analysis (empty for reused ones)"""
+    for stage, seconds in analysis['timings'].items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+def cache_entry(analysis):
+    """The parts of a pipeline analysis that repeats of the same input reuse"""
+    return {'ingredients': analysis['ingredients'],
+            'predictions': analysis['predictions'],
+            'gibberish': analysis['gibberish']}
+
+def analyze_text_cached(text, verbose=True):
+    """(analysis, reused) of label text, reusing a recent analysis of the same text
+    
+    Every endpoint stores and reuses the whole analyze_text result, so
+    which endpoint filled the cache makes no difference to the answer.
+    """
+    cache_key = (canonical_text(text), classifier.generation)
+    cached = text_result_cache.get(cache_key)
+    if cached is not None:
+        if verbose:
+            print(f"  ♻️ Same label text analyzed recently, reusing its {len(cached['ingredients'])} ingredients")
+        return dict(cached, timings={}), True
+    analysis = analyze_text(text, verbose=verbose)
+    text_result_cache.put(cache_key, cache_entry(analysis))
+    return analysis, False
+
+def api_result(source_type, text, analysis, cached, ocr_result=None, start=None):
+    """Record stage metrics and build the JSON body of /api/analyze (and the last /analyze/stream event)"""
+    record_stage_seconds(analysis)
+    ANALYSES_TOTAL.inc(source=source_type)
+    
+    timings = {stage: round(seconds * 1000, 1) for stage, seconds in analysis['timings'].items()}
+    if start is not None:
+        timings['total'] = round((time.perf_counter() - start) * 1000, 1)
+    result = {
+        'source': source_type,
+        'text': text,
+        'ingredients': analysis['ingredients'],
+        'predictions': analysis['predictions'],
+        'stats': compute_stats(analysis['predictions']),
+        'gibberish': analysis['gibberish'],
+        'cached': cached,
+        'timings_ms': timings,
+    }
+    if ocr_result is not None:
+        result['text'] = ocr_result['text']
+        result['ocr'] = {
+            'confidence': ocr_result['confidence'],
+            'partial': ocr_result['partial'],
+            'rejected': ocr_result.get('rejected'),
+            'error': ocr_result['error'],
+        }
+    return result
+
+def remember_upload(fingerprint, ocr_result, analysis, generation):
+    """Add a complete image analysis, predicted under classifier generation, to the duplicate upload index"""
+    if not ocr_result['partial'] and not ocr_result['error']:
+        upload_index.add(fingerprint, dict(cache_entry(analysis), ocr_result=ocr_result), generation)
+
+@app.route('/api/analyze', methods=['POST'])
+def api_analyze():
+    """Full analysis as JSON: same pipeline and caches as /analyze, no template or debug output"""
+    start = time.perf_counter()
+    try:
+        text, image_bytes = read_api_input()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if text is not None and not text.strip():
+        return jsonify({'error': 'No ingredients provided'}), 400
+    
+    try:
+        ocr_result = None
+        if text is not None:
+            source_type = "text"
+            analysis, reused = analyze_text_cached(text, verbose=False)
+        else:
+            source_type = "image"
+            fingerprint = upload_index.fingerprint(image_bytes=image_bytes)
+            cached = upload_index.lookup(fingerprint, classifier.generation)
+            reused = cached is not None
+            if reused:
+                analysis = dict(cached, timings={})
+                ocr_result = cached['ocr_result']
+            else:
+                ocr_start = time.perf_counter()
+                with profiler.stage('ocr'):
+                    ocr_result = ocr_engine.extract_text_detailed(
+                        image_bytes=image_bytes, deadline=Deadline(app.config['ANALYZE_TIME_BUDGET']))
+                generation = classifier.generation
+                analysis = analyze_ocr_result(ocr_result, time.perf_counter() - ocr_start, verbose=False)
+                remember_upload(fingerprint, ocr_result, analysis, generation)
+    except Exception as e:
+        REQUEST_ERRORS_TOTAL.inc(endpoint='api_analyze')
+        return jsonify({'error': f"{type(e).__name__}: {e}"}), 500
+    
+    result = api_result(source_type, text, analysis, reused, ocr_result, start)
+    if ocr_result is not None and ocr_result['error'] and not analysis['ingredients']:
+        # Undecodable or unreadable image
+        return jsonify(result), 422
+    return jsonify(result)
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """Image analysis as NDJSON: each OCR line and prediction as soon as it is ready, then the result
+    
+    Takes the same input as /api/analyze. Events are one JSON object per
+    line: {"event": "line"}, {"event": "prediction"} and finally
+    {"event": "done"} with the /api/analyze fields, or {"event": "error"}.
+    Text input is analyzed at once (predictions, then done). The done
+    event carries a result_id; /analyze/result/<result_id> renders the
+    full report from it without uploading or reading the image again.
+    Line-by-line OCR results are not added to the duplicate upload index,
+    which only holds results of the strategy OCR used by /analyze.
+    """
+    start = time.perf_counter()
+    try:
+        text, image_bytes = read_api_input()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if text is not None and not text.strip():
+        return jsonify({'error': 'No ingredients provided'}), 400
+    deadline = Deadline(app.config['ANALYZE_TIME_BUDGET'])
+    
+    def events():
+        if text is not None:
+            analysis = analyze_text(text, verbose=False)
+            for prediction in analysis['predictions']:
+                yield dict(prediction, event='prediction')
+            yield dict(api_result("text", text, analysis, False, start=start), event='done')
+            return
+        
+        fingerprint = upload_index.fingerprint(image_bytes=image_bytes)
+        cached = upload_index.lookup(fingerprint, classifier.generation)
+        if cached:
+            for prediction in cached['predictions']:
+                yield dict(prediction, event='prediction')
+            yield dict(api_result("image", None, dict(cached, timings={}), True, cached['ocr_result'], start),
+                       event='done')
+            return
+        
+        for event in stream_image_analysis(image_bytes=image_bytes, deadline=deadline, verbose=False):
+            if event['event'] == 'done':
+                ocr_result = event.pop('ocr_result')
+                event = dict(api_result("image", None, event, False, ocr_result, start), event='done')
+            yield event
+    
+    def generate():
+        try:
+            for event in events():
+                if event['event'] == 'done':
+                    event['result_id'] = secrets.token_urlsafe(16)
+                    stream_reports.put(event['result_id'], event)
+                yield json.dumps(event, ensure_ascii=False) + '\n'
+        except Exception as e:
+            REQUEST_ERRORS_TOTAL.inc(endpoint='analyze_stream')
+            yield json.dumps({'event': 'error', 'error': f"{type(e).__name__}: {e}"}) + '\n'
+    
+    # stream_with_context keeps the request (and its admission slot) open until the last event
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/analyze/result/<result_id>')
+def stream_report(result_id):
+    """Full report page of a finished /analyze/stream result"""
+    result = stream_reports.get(result_id)
+    if result is None:
+        flash("❌ This result has expired. Please analyze the label again.", "error")
+        return render_template('index.html'), 404
+    
+    ocr = result.get('ocr') or {}
+    source_type = result['source']
+    original_text = (result['text'] or "")[:500]
+    if ocr.get('rejected'):
+        return render_template('result.html', predictions=None, stats=None, source_type=source_type,
+                               original_text=original_text, gibberish_detected=False,
+                               quality_reason=ocr['rejected'])
+    if not result['predictions']:
+        if result['gibberish']:
+            GIBBERISH_TOTAL.inc()
+            return render_template('result.html', predictions=None, stats=None, source_type=source_type,
+                                   original_text=original_text, gibberish_detected=True)
+        flash("❌ No valid ingredients found. The image quality might be too low or the text is unreadable.", "error")
+        return render_template('index.html')
+    return render_template('result.html',
+                           predictions=result['predictions'],
+                           stats=result['stats'],
+                           source_type=source_type,
+                           original_text=original_text,
+                           gibberish_detected=False,
+                           ocr_partial=bool(ocr.get('partial')))
+
+@app.route('/api/analyze/live', methods=['POST'])
+def api_analyze_live():
+    """Live-typing analysis: only segments changed since the session's last revision are re-analyzed
+    
+    JSON body: {"session", "revision", "text"} or {"session", "revision",
+    "base_revision", "edits": [{"start", "end", "text"}]}. The session id
+    is created on the first call and returned. The response lists the
+    added segments with their predictions and the removed segment keys
+    (see app/live.py); 409 means the client is out of sync and should
+    resend its full text in a new session.
+    """
+    start = time.perf_counter()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON object body required'}), 400
+    text, edits = data.get('text'), data.get('edits')
+    session_id, revision = data.get('session'), data.get('revision')
+    if (text is None) == (edits is None):
+        return jsonify({'error': "Provide either 'text' or 'edits'"}), 400
+    if text is not None and not isinstance(text, str) or edits is not None and not isinstance(edits, list):
+        return jsonify({'error': "'text' must be a string and 'edits' a list"}), 400
+    if session_id is not None and (not isinstance(session_id, str) or len(session_id) > 64):
+        return jsonify({'error': "'session' must be a string of at most 64 characters"}), 400
+    if revision is not None and not isinstance(revision, int):
+        return jsonify({'error': "'revision' must be an integer"}), 400
+    
+    try:
+        result = live_analyzer.analyze(session_id, revision, text, edits, data.get('base_revision'))
+    except StaleRevision as e:
+        return jsonify({'error': str(e), 'stale': True}), 409
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f"Malformed edits: {e}"}), 400
+    result['timings_ms'] = {'total': round((time.perf_counter() - start) * 1000, 1)}
+    return jsonify(result)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Expose in-process counters and histograms in Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 until the startup warm-up has finished
+    
+    Servers that never call warm_up (gunicorn and other WSGI servers) get
+    it started in the background by the first probe.
+    """
+    start_warm_up(app)
+    return jsonify(readiness.as_dict()), (200 if readiness.is_ready else 503)
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """A stored request profile: the JSON summary, or ?format=prof for the raw pstats file
+    
+    Needs the profiling token like the profiled request did; answers 404
+    to everyone else, so the switch is invisible when it is off.
+    """
+    if not profiler.authorized(request.headers.get(profiler.HEADER) or request.args.get(profiler.QUERY_PARAM)):
+        return jsonify({'error': 'Not found'}), 404
+    extension = 'prof' if request.args.get('format') == 'prof' else 'json'
+    path = profiler.path(profile_id, extension)
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Not found'}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f"{profile_id}.{extension}")
+
 @app.errorhandler(413)
 def too_large(e):
     return "File is too large. Maximum size is 64MB.", 413
 
 if __name__ == '__main__':
+    # debug=True runs this block in the reloader's watcher process too; only the serving child warms up
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up(app)
     print("\n🌐 Open http://localhost:5000 in your browser")
     print("="*60)
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
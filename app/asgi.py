@@ -0,0 +1,271 @@
+"""
+ASGI entry point: the routes of app.app served from an asyncio event loop.
+
+Request bodies are read without blocking and responses are written as the
+client accepts them, so a slow mobile connection costs a coroutine rather
+than a thread. Only once a request has fully arrived does its Flask view
+(with the OCR, NLP and ML stages) run on a thread pool: analysis routes on
+one sized so that the admission lanes, not the pool, decide what waits,
+everything else on a small pool of its own.
+
+Serve with any ASGI server:
+    uvicorn app.asgi:application --port 5000
+or with the bundled aiohttp runner:
+    python -m app.asgi --port 5000
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.admission import admission
+from app.app import app as flask_app
+from app.warmup import warm_up
+
+# Routes whose views run the analysis pipeline (see admission_lane in app.py)
+ANALYSIS_PATHS = {'/analyze', '/analyze/stream', '/api/analyze', '/api/analyze/live', '/api/predict'}
+
+
+def analysis_threads():
+    """Threads for analysis views: every admitted and queued request of every lane"""
+    override = os.environ.get('RISKREAD_ASGI_ANALYSIS_THREADS')
+    if override:
+        return int(override)
+    if any(not lane.max_concurrent for lane in admission.lanes.values()):
+        return 64
+    return sum(lane.max_concurrent + lane.max_waiting for lane in admission.lanes.values())
+
+
+analysis_executor = ThreadPoolExecutor(max_workers=analysis_threads(), thread_name_prefix='asgi-analysis')
+default_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('RISKREAD_ASGI_THREADS', 16)),
+                                      thread_name_prefix='asgi')
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+async def read_body(receive, limit):
+    """Whole request body, awaited chunk by chunk; raises RequestTooLarge beyond limit bytes"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit and size > limit:
+            raise RequestTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI http scope whose body has already been read"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            if name == 'CONTENT_TYPE':
+                environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def run_wsgi(environ, loop, events):
+    """Run the Flask app in this thread, handing the response to the event loop as it is produced
+    
+    The WSGI iterable is consumed in this one thread (streamed responses
+    keep the Flask request context open across chunks); chunks are queued
+    for the event loop without waiting for the client to read them.
+    """
+    def emit(*event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+    
+    def start_response(status, headers, exc_info=None):
+        emit('start', int(status.split(' ', 1)[0]), headers)
+        return lambda data: emit('body', data)
+    
+    try:
+        iterable = flask_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if chunk:
+                    emit('body', chunk)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+    except Exception as e:
+        print(f"❌ ASGI bridge error for {environ['PATH_INFO']}: {e}")
+    finally:
+        emit('end')
+
+
+async def send_simple(send, status, body, content_type=b'text/plain; charset=utf-8'):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle_http(scope, receive, send):
+    limit = flask_app.config.get('MAX_CONTENT_LENGTH')
+    headers = dict(scope.get('headers', []))
+    declared = headers.get(b'content-length')
+    if limit and declared and declared.isdigit() and int(declared) > limit:
+        # Refuse before reading a single byte of the upload
+        return await send_simple(send, 413, b"File is too large. Maximum size is 64MB.")
+    try:
+        body = await read_body(receive, limit)
+    except RequestTooLarge:
+        return await send_simple(send, 413, b"File is too large. Maximum size is 64MB.")
+    if body is None:
+        return
+    
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    executor = analysis_executor if scope['path'] in ANALYSIS_PATHS else default_executor
+    worker = loop.run_in_executor(executor, run_wsgi, build_environ(scope, body), loop, events)
+    
+    started = False
+    try:
+        while True:
+            event = await events.get()
+            if event[0] == 'start':
+                await send({'type': 'http.response.start', 'status': event[1],
+                            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                        for name, value in event[2]]})
+                started = True
+            elif event[0] == 'body':
+                await send({'type': 'http.response.body', 'body': event[1], 'more_body': True})
+            else:
+                break
+        if started:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        else:
+            await send_simple(send, 500, b"Internal Server Error")
+    finally:
+        # If the client went away, the view still finishes on its thread
+        await asyncio.shield(worker)
+
+
+async def startup():
+    # Warm-up imports models and runs tesseract: keep it off the event loop
+    await asyncio.get_running_loop().run_in_executor(default_executor, warm_up, flask_app)
+
+
+async def shutdown():
+    analysis_executor.shutdown(wait=False)
+    default_executor.shutdown(wait=False)
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await startup()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI 3 application"""
+    if scope['type'] == 'http':
+        await handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+
+
+def serve(host='0.0.0.0', port=5000):
+    """Serve the ASGI application with aiohttp (already a dependency), without an ASGI server"""
+    from aiohttp import web
+    
+    async def handle(request):
+        async def receive():
+            chunk = await request.content.readany()
+            return {'type': 'http.request', 'body': chunk, 'more_body': bool(chunk)}
+        
+        response = None
+        
+        async def send(message):
+            nonlocal response
+            if message['type'] == 'http.response.start':
+                response = web.StreamResponse(status=message['status'])
+                for name, value in message['headers']:
+                    response.headers.add(name.decode('latin-1'), value.decode('latin-1'))
+                await response.prepare(request)
+            elif message['type'] == 'http.response.body':
+                if message.get('body'):
+                    await response.write(message['body'])
+                if not message.get('more_body'):
+                    await response.write_eof()
+        
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': f"{request.version.major}.{request.version.minor}",
+            'method': request.method,
+            'scheme': request.scheme,
+            'path': request.path,
+            'query_string': request.query_string.encode('latin-1'),
+            'root_path': '',
+            'headers': list(request.raw_headers),
+            'client': (request.remote or '', 0),
+            'server': (host, port),
+        }
+        await application(scope, receive, send)
+        return response
+    
+    server = web.Application(client_max_size=flask_app.config.get('MAX_CONTENT_LENGTH') or 1024 ** 2)
+    server.router.add_route('*', '/{tail:.*}', handle)
+    server.on_startup.append(lambda _: startup())
+    server.on_cleanup.append(lambda _: shutdown())
+    print(f"\n🌐 RiskRead (asyncio) on http://{host}:{port}")
+    web.run_app(server, host=host, port=port, access_log=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve RiskRead from an asyncio event loop")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Incremental analysis of label text while it is being typed.
+
+The text is split into segments at the extractor's own boundaries
+(SEGMENT_BOUNDARY), so analyzing it segment by segment gives the same
+ingredients as analyzing it whole, and each session remembers the
+predictions of every segment it has seen. A new revision of the text only sends its new segments
+through extraction and classification; the response lists the segments
+that appeared (with their predictions) and the ones that disappeared.
+"""
+import os
+import secrets
+import threading
+
+from app.pipeline import canonical_text, compute_stats, extract_ingredients
+from ml.predict import classifier
+from nlp.ingredient_extractor import SEGMENT_BOUNDARY
+from perf.cache import TTLCache
+from perf.metrics import metrics
+
+LIVE_SEGMENTS_TOTAL = metrics.counter(
+    'riskread_live_segments_total', 'Segments of live-typed text, analyzed or reused from the session', ['outcome'])
+
+
+class StaleRevision(Exception):
+    """The request does not follow the session's current revision"""
+
+
+def split_segments(text):
+    """Canonical segment keys of text, in order and without duplicates"""
+    keys = []
+    for part in SEGMENT_BOUNDARY.split(text):
+        key = canonical_text(part)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def apply_edits(text, edits):
+    """Apply [{'start', 'end', 'text'}] replacements in order, each against the previous result"""
+    for edit in edits:
+        start, end = int(edit['start']), int(edit['end'])
+        if not 0 <= start <= end <= len(text):
+            raise ValueError(f"Edit range {start}-{end} is outside the text")
+        text = text[:start] + str(edit.get('text', '')) + text[end:]
+    return text
+
+
+class LiveSession:
+    """Text and per-segment predictions of one live-typing client"""
+    
+    def __init__(self, session_id):
+        self.id = session_id
+        self.revision = 0
+        self.text = ""
+        self.segments = {}        # segment key -> predictions
+        self.generation = classifier.generation
+        self.lock = threading.Lock()
+    
+    def update(self, text, revision):
+        """Move to a new revision of the text; returns (added, removed, reset)
+        
+        reset is True when the model changed since the last revision: every
+        segment is then re-analyzed and reported as added.
+        """
+        reset = classifier.generation != self.generation
+        if reset:
+            self.segments = {}
+            self.generation = classifier.generation
+        keys = split_segments(text)
+        removed = [key for key in self.segments if key not in keys]
+        for key in removed:
+            del self.segments[key]
+        
+        added = []
+        for key in keys:
+            if key in self.segments:
+                LIVE_SEGMENTS_TOTAL.inc(outcome='reused')
+                continue
+            ingredients = extract_ingredients(key, "text", verbose=False)
+            self.segments[key] = classifier.predict_multiple(ingredients) if ingredients else []
+            added.append({'segment': key, 'predictions': self.segments[key]})
+            LIVE_SEGMENTS_TOTAL.inc(outcome='analyzed')
+        
+        self.text = text
+        self.revision = revision
+        return added, removed, reset
+    
+    def stats(self):
+        """Label counts over the distinct ingredients of the current text"""
+        predictions = {}
+        for segment_predictions in self.segments.values():
+            for prediction in segment_predictions:
+                predictions.setdefault(prediction['ingredient'].lower(), prediction)
+        return compute_stats(list(predictions.values()))
+
+
+class LiveAnalyzer:
+    """Live-typing sessions, dropped after ttl seconds of inactivity
+    
+    RISKREAD_LIVE_SESSIONS (default 10000) bounds the number of sessions
+    and RISKREAD_LIVE_SESSION_TTL (seconds, default 1800) their lifetime.
+    """
+    
+    def __init__(self, max_sessions=None, ttl=None):
+        if max_sessions is None:
+            max_sessions = int(os.environ.get('RISKREAD_LIVE_SESSIONS', 10000))
+        if ttl is None:
+            ttl = float(os.environ.get('RISKREAD_LIVE_SESSION_TTL', 1800))
+        self.sessions = TTLCache('live_sessions', max_entries=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+    
+    def _session(self, session_id):
+        """(session, created) for session_id, creating a new session if it is unknown or expired"""
+        with self._lock:
+            session = self.sessions.get(session_id) if session_id else None
+            created = session is None
+            if created:
+                session = LiveSession(session_id or secrets.token_urlsafe(16))
+            # Re-inserting refreshes the session's TTL
+            self.sessions.put(session.id, session)
+        return session, created
+    
+    def analyze(self, session_id=None, revision=None, text=None, edits=None, base_revision=None):
+        """Analyze a new revision of a session's text; returns the delta response dict
+        
+        Pass either the full text or edits against base_revision (which
+        must be the session's current revision). The response has 'reset'
+        set when the session was new or expired or the model changed: the
+        client must then drop its segment map before applying 'added'. Raises StaleRevision
+        for out-of-order revisions or edits against another revision, and
+        ValueError for malformed edits.
+        """
+        session, created = self._session(session_id)
+        with session.lock:
+            if edits is not None:
+                if created or base_revision != session.revision:
+                    raise StaleRevision(f"Edits apply to revision {base_revision}, "
+                                        f"session is at revision {0 if created else session.revision}")
+                text = apply_edits(session.text, edits)
+            if revision is None:
+                revision = session.revision + 1
+            elif not created and revision <= session.revision:
+                raise StaleRevision(f"Revision {revision} is not newer than {session.revision}")
+            
+            added, removed, reset = session.update(text or "", revision)
+            return {
+                'session': session.id,
+                'revision': session.revision,
+                'reset': created or reset,
+                'added': added,
+                'removed': removed,
+                'segments': len(session.segments),
+                'stats': session.stats(),
+            }
+
+
+# Create a global instance
+live_analyzer = LiveAnalyzer()
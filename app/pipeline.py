@@ -0,0 +1,198 @@
+"""
+Analysis pipeline shared by the web app and batch tools:
+label text -> ingredients -> cleaned ingredients -> predictions -> stats.
+"""
+import queue
+import re
+import threading
+import time
+
+from nlp.ingredient_extractor import ingredient_extractor
+from nlp.post_processor import post_processor
+from ml.predict import classifier
+from ocr.ocr_engine import ocr_engine
+from perf.profiling import profiler
+
+
+def extract_ingredients(text, source_type="text", verbose=True):
+    """Extract and clean ingredient names (OCR text gets the stricter OCR extractor)
+    
+    text may also be a list of texts (the pages of a document), extracted
+    one by one and cleaned together.
+    """
+    ingredients = []
+    for part in [text] if isinstance(text, str) else text:
+        if source_type == "image":
+            ingredients.extend(ingredient_extractor.extract_from_ocr(part, verbose))
+        else:
+            ingredients.extend(ingredient_extractor.extract_ingredients(part, verbose))
+    
+    if ingredients:
+        try:
+            ingredients = post_processor.clean_ingredient_list(ingredients)
+        except Exception as e:
+            print(f"⚠️ Post-processor failed: {e}, using raw ingredients")
+    return ingredients
+
+
+def emergency_ingredients(text):
+    """Comma-separated parts of text that look like words, for text the extractor found nothing in"""
+    ingredients = []
+    for part in text.split(','):
+        part = part.strip()
+        if part and len(part) > 3:
+            for prefix in ['made of:', 'contains:', 'ingredients:', 'less than']:
+                if part.lower().startswith(prefix):
+                    part = part[len(prefix):].strip()
+            if len(part) < 20 and len(re.findall(r'[aeiou]', part.lower())) == 0:
+                continue # Skip parts with no vowels
+            if part:
+                ingredients.append(part)
+    return ingredients
+
+
+def canonical_text(text):
+    """Cache key form of label text: lowercased, whitespace collapsed and trimmed
+    
+    Only differences the extractor ignores anyway are folded together:
+    clean_text lowercases and collapses whitespace before anything else
+    depends on it, so texts with the same key yield the same ingredients.
+    Commas are left alone, since whether " and " / " or " separate
+    ingredients depends on the spaces around them.
+    """
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+
+def compute_stats(predictions):
+    """Count predictions per label"""
+    return {
+        'total': len(predictions),
+        'harmful': sum(1 for p in predictions if p['label'] == 'Harmful'),
+        'controversial': sum(1 for p in predictions if p['label'] == 'Controversial'),
+        'safe': sum(1 for p in predictions if p['label'] == 'Not Harmful')
+    }
+
+
+def analyze_text(text, source_type="text", verbose=True):
+    """Run extraction, cleaning and classification on label text (or a list of page texts)
+    
+    Returns a dict with ingredients, predictions, stats, gibberish and
+    timings (seconds per stage: nlp, ml). When the extractor finds
+    nothing, OCR text of more than a few characters is taken to be
+    gibberish; other text falls back to emergency_ingredients.
+    verbose=False silences the extractor's debug output.
+    """
+    timings = {}
+    start = time.perf_counter()
+    gibberish = False
+    with profiler.stage('nlp'):
+        ingredients = extract_ingredients(text, source_type, verbose)
+        if not ingredients:
+            whole = text if isinstance(text, str) else ', '.join(text)
+            if source_type == "image" and len(whole) > 10:
+                gibberish = True
+            else:
+                ingredients = emergency_ingredients(whole)
+    timings['nlp'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with profiler.stage('ml'):
+        predictions = classifier.predict_multiple(ingredients) if ingredients else []
+    timings['ml'] = time.perf_counter() - start
+    
+    return {
+        'ingredients': ingredients,
+        'predictions': predictions,
+        'stats': compute_stats(predictions),
+        'gibberish': gibberish,
+        'timings': timings,
+    }
+
+
+def analyze_ocr_result(ocr_result, ocr_seconds, verbose=True):
+    """Analyze the text of an extract_text_detailed result; adds text, confidence, error and ocr timing
+    
+    Multi-page results are analyzed from the ingredient section joined
+    across their pages when one was found, else page by page.
+    """
+    if ocr_result.get('section') or not ocr_result.get('pages'):
+        text = ocr_result.get('section') or ocr_result['text']
+    else:
+        text = [page['text'] for page in ocr_result['pages'] if page['text']]
+    analysis = analyze_text(text, source_type="image", verbose=verbose)
+    analysis['timings']['ocr'] = ocr_seconds
+    analysis.update({
+        'text': ocr_result['text'],
+        'confidence': ocr_result['confidence'],
+        'partial': ocr_result['partial'],
+        'rejected': ocr_result.get('rejected'),
+        'error': ocr_result['error'],
+    })
+    return analysis
+
+
+def analyze_image(image_path=None, image_bytes=None, deadline=None, verbose=True, **ocr_options):
+    """OCR an image, then analyze its text (see analyze_ocr_result)"""
+    start = time.perf_counter()
+    with profiler.stage('ocr'):
+        ocr_result = ocr_engine.extract_text_detailed(image_path, image_bytes, deadline=deadline, **ocr_options)
+    return analyze_ocr_result(ocr_result, time.perf_counter() - start, verbose)
+
+
+def settled_ingredients(text, verbose=True):
+    """Ingredients of partial OCR text that the lines still to come cannot change
+    
+    The last ingredient may continue on the next line ("natural and
+    artificial / flavors"), so it only counts once the text ends at a
+    separator.
+    """
+    ingredients = extract_ingredients(text, "image", verbose)
+    if ingredients and not text.rstrip().endswith((',', ';', '.', ')')):
+        ingredients = ingredients[:-1]
+    return ingredients
+
+
+def stream_image_analysis(image_path=None, image_bytes=None, deadline=None, verbose=True, **ocr_options):
+    """Analyze an image line by line, yielding progress events as dicts
+    
+    OCR runs in lines mode on a background thread. Each recognized line is
+    yielded as {'event': 'line'} as soon as it is read, followed by a
+    {'event': 'prediction'} for every ingredient it completes. The last
+    event is {'event': 'done'} with the analyze_ocr_result fields for the
+    whole text (the authoritative result) plus the raw 'ocr_result'.
+    """
+    events = queue.Queue()
+    
+    def run_ocr():
+        start = time.perf_counter()
+        try:
+            ocr_result = ocr_engine.extract_text_detailed(
+                image_path, image_bytes, deadline=deadline, mode='lines',
+                on_line=lambda line: events.put(('line', line)), **ocr_options)
+        except Exception as e:
+            ocr_result = dict(ocr_engine._new_result(), error=f"OCR Error: {e}")
+        events.put(('done', (ocr_result, time.perf_counter() - start)))
+    
+    threading.Thread(target=run_ocr, name='stream-ocr', daemon=True).start()
+    
+    text = ""
+    predicted = set()
+    while True:
+        kind, item = events.get()
+        if kind == 'done':
+            break
+        text = f"{text} {item['text']}".strip()
+        yield {'event': 'line', 'text': item['text'], 'confidence': item['confidence']}
+        
+        new = [name for name in settled_ingredients(text, verbose) if name.lower() not in predicted]
+        for prediction in classifier.predict_multiple(new):
+            predicted.add(prediction['ingredient'].lower())
+            yield dict(prediction, event='prediction')
+    
+    ocr_result, ocr_seconds = item
+    analysis = analyze_ocr_result(ocr_result, ocr_seconds, verbose)
+    # Ingredients only recognizable in the complete text (e.g. the last one)
+    for prediction in analysis['predictions']:
+        if prediction['ingredient'].lower() not in predicted:
+            yield dict(prediction, event='prediction')
+    yield dict(analysis, event='done', ocr_result=ocr_result)
@@ -0,0 +1,138 @@
+import threading
+import time
+
+from perf.metrics import metrics
+
+WARMUP_SECONDS = metrics.gauge(
+    'riskread_warmup_seconds', 'Duration of each warm-up step at startup', ['step'])
+READY = metrics.gauge(
+    'riskread_ready', '1 once the startup warm-up has finished')
+
+# Canned ingredient list pushed through the text path
+WARMUP_INGREDIENTS = (
+    "Ingredients: enriched wheat flour, sugar/glucose-fructose, hydrogenated palm kernel oil; "
+    "less than 2% of: citric acid, modified corn starch, natural and artificial flavors, "
+    "sodium citrate, colors (yellow 5 lake, red 40), salt, baking powder, xylitol"
+)
+
+
+class Readiness:
+    """Tracks whether the warm-up has started and finished, and what it measured"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.started = False
+        self.timings = {}
+        self.errors = {}
+
+    @property
+    def is_ready(self):
+        return self._event.is_set()
+
+    def claim(self):
+        """True for the first caller only: the one that runs the warm-up"""
+        with self._lock:
+            if self.started:
+                return False
+            self.started = True
+            return True
+
+    def mark_ready(self):
+        self._event.set()
+        READY.set(1)
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def as_dict(self):
+        return {
+            'status': 'ready' if self.is_ready else 'warming_up',
+            'warmup_ms': {step: round(seconds * 1000, 1) for step, seconds in self.timings.items()},
+            'errors': dict(self.errors),
+        }
+
+
+readiness = Readiness()
+
+
+def _step(name, func):
+    """Run one warm-up step, recording its duration and any error"""
+    start = time.perf_counter()
+    result = None
+    try:
+        result = func()
+    except Exception as e:
+        readiness.errors[name] = str(e)
+        print(f"  ⚠️ Warm-up step '{name}' failed: {e}")
+    elapsed = time.perf_counter() - start
+    readiness.timings[name] = elapsed
+    WARMUP_SECONDS.set(elapsed, step=name)
+    print(f"  {'✓' if name not in readiness.errors else '✗'} {name:<12} {elapsed * 1000:8.1f} ms")
+    return result
+
+
+def warm_up(flask_app):
+    """Push a synthetic label and a canned ingredient list through the pipeline
+
+    Loads tesseract traineddata, OpenCV, the sklearn model, regex caches and
+    the Jinja templates so the first real request does not pay for them.
+    Readiness flips once every step has run, even if some failed (e.g. the
+    tesseract binary is missing); failures are reported by /ready.
+    Runs once per process: later calls wait for that run and return its
+    report.
+    """
+    if not readiness.claim():
+        readiness.wait()
+        return readiness.as_dict()
+
+    from ocr.ocr_engine import ocr_engine, pytesseract
+    from ocr.synthetic import make_label_bytes
+    from nlp.ingredient_extractor import ingredient_extractor
+    from nlp.post_processor import post_processor
+    from ml.predict import classifier
+
+    print("\n🔥 Warming up RiskRead...")
+    total_start = time.perf_counter()
+
+    _step('model', classifier.load_model)
+    _step('tesseract', pytesseract.get_tesseract_version)
+    label_bytes = _step('synthetic', make_label_bytes)
+
+    def read_label():
+        # extract_text_detailed reports failures in the result rather than raising
+        result = ocr_engine.extract_text_detailed(image_bytes=label_bytes)
+        if result['error'] or result.get('rejected'):
+            raise RuntimeError(result['error'] or f"quality gate rejected the label ({result['rejected']})")
+        if not result['text'].strip():
+            raise RuntimeError("no text read from the synthetic label")
+        return result['text']
+
+    ocr_text = _step('ocr', read_label) if label_bytes else None
+    _step('nlp_ocr', lambda: ingredient_extractor.extract_from_ocr(ocr_text or ""))
+    ingredients = _step('nlp_text', lambda: post_processor.clean_ingredient_list(
+        ingredient_extractor.extract_ingredients(WARMUP_INGREDIENTS)))
+    predictions = _step('ml', lambda: classifier.predict_multiple(ingredients or []))
+
+    def render_templates():
+        from flask import render_template
+        stats = {'total': len(predictions or []), 'harmful': 0, 'controversial': 0, 'safe': 0}
+        with flask_app.test_request_context('/'):
+            render_template('index.html')
+            render_template('result.html', predictions=predictions or [], stats=stats,
+                            source_type='text', original_text=WARMUP_INGREDIENTS,
+                            gibberish_detected=False)
+
+    _step('templates', render_templates)
+
+    readiness.timings['total'] = time.perf_counter() - total_start
+    WARMUP_SECONDS.set(readiness.timings['total'], step='total')
+    readiness.mark_ready()
+    print(f"✅ Warm-up finished in {readiness.timings['total'] * 1000:.0f} ms")
+    return readiness.as_dict()
+
+
+def start_warm_up(flask_app):
+    """Run warm_up on a background thread unless it has already started"""
+    if not readiness.started:
+        threading.Thread(target=warm_up, args=(flask_app,), name='warm-up', daemon=True).start()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for RiskRead cold start.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each target and fails if the cumulative import time exceeds its budget, or if
+a heavy package (cv2, sklearn, nltk, ...) is pulled in at import time.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 800 --runs 5 --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> default budget in milliseconds (median of runs)
+TARGETS = {
+    'app.app': 600,
+    'run': 150,
+}
+
+# Packages that must stay out of the import path
+HEAVY_MODULES = ['cv2', 'pytesseract', 'numpy', 'PIL.Image', 'sklearn', 'nltk', 'pandas', 'datasets']
+
+LINE_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module):
+    """Return (total_ms, {module: cumulative_us}) for one cold import"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True,
+        env=dict(os.environ, RISKREAD_LAZY_IMPORTS='1'),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        _, cum_us, indent, name = match.groups()
+        cumulative[name] = int(cum_us)
+        # Top-level imports (one space of indent) add up to the total
+        if len(indent) == 1:
+            total_us += int(cum_us)
+    return total_us / 1000, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RiskRead import-time budget check")
+    parser.add_argument('--budget-ms', type=float, help="Override the budget for every target")
+    parser.add_argument('--runs', type=int, default=3, help="Cold imports per target (median is used)")
+    parser.add_argument('--top', type=int, default=10, help="Show the N slowest imports")
+    parser.add_argument('modules', nargs='*', help="Modules to check (default: app.app, run)")
+    args = parser.parse_args()
+
+    modules = args.modules or list(TARGETS)
+    failed = False
+
+    for module in modules:
+        budget = args.budget_ms or TARGETS.get(module, 1000)
+        totals = []
+        cumulative = {}
+        for _ in range(args.runs):
+            total_ms, cumulative = measure(module)
+            totals.append(total_ms)
+        median = statistics.median(totals)
+
+        status = "✓" if median <= budget else "✗"
+        print(f"{status} import {module}: {median:.1f} ms (budget {budget:.0f} ms, runs {[round(t, 1) for t in totals]})")
+
+        heavy = [name for name in HEAVY_MODULES if name in cumulative]
+        if heavy:
+            print(f"  ✗ heavy modules imported eagerly: {', '.join(heavy)}")
+            failed = True
+        if median > budget:
+            failed = True
+
+        slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for name, cum_us in slowest:
+            print(f"    {cum_us / 1000:8.1f} ms  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Line-level parallel OCR vs whole-page --psm 6.
+
+Renders synthetic ingredient panels of increasing length and times:
+  page   - one tesseract --psm 6 call on the binarized page
+  lines  - OCREngine mode='lines' (per-line --psm 7 in a thread pool)
+Accuracy is the word-level similarity to the rendered text; bands is the
+number of line bands the segmentation found (one per rendered line is
+ideal, far fewer means it merged lines).
+
+Each panel is rendered under every --conditions entry:
+  clean  - flat white background
+  noisy  - Gaussian pixel noise (--noise)
+  photo  - noise plus blur, uneven lighting and a slight perspective tilt
+
+Usage:
+    python benchmarks/line_ocr.py
+    python benchmarks/line_ocr.py --lines 10 40 80 --workers 4 --repeat 3
+    python benchmarks/line_ocr.py --conditions noisy photo --noise 25
+"""
+import argparse
+import difflib
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from ocr.ocr_engine import ocr_engine, pytesseract
+from ocr.preprocess_graph import PreprocessGraph
+from ocr.synthetic import make_label_image
+
+WORDS = [
+    "sugar", "wheat flour", "palm oil", "cocoa butter", "skim milk powder",
+    "soy lecithin", "salt", "natural flavors", "citric acid", "red 40",
+    "modified corn starch", "sodium bicarbonate", "yellow 5 lake", "dextrose",
+]
+
+
+CONDITIONS = ['clean', 'noisy', 'photo']
+
+
+def make_panel(line_count, font_size, noise=0, seed=0):
+    lines = ["Ingredients:"]
+    for i in range(line_count):
+        lines.append(", ".join(WORDS[(i + j) % len(WORDS)] for j in range(3)) + ",")
+    height = int(font_size * 1.6) * (line_count + 1) + 40
+    image = make_label_image(lines=lines, size=(font_size * 24, height), noise=noise,
+                             font_size=font_size, seed=seed)
+    return image, " ".join(lines), len(lines)
+
+
+def photograph(bgr, noise, seed=0):
+    """Approximate a phone photo of the panel: tilt, sensor noise, defocus and a light falloff"""
+    rng = np.random.default_rng(seed)
+    height, width = bgr.shape[:2]
+    # About a degree of tilt and a slight keystone, whatever the panel's height
+    dx, dy = width * 0.04, width * 0.02
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    tilted = np.float32([[dx, dy], [width - dx * 0.5, 0], [width, height - dy], [0, height]])
+    image = cv2.warpPerspective(bgr, cv2.getPerspectiveTransform(corners, tilted), (width, height),
+                                borderMode=cv2.BORDER_REPLICATE)
+    image = image.astype(np.float32) + rng.normal(0, noise, image.shape)
+    image = cv2.GaussianBlur(image, (5, 5), 1.2)
+    # Light falling off from the top-left corner to about 55% at the far corner
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    light = 1.0 - 0.45 * np.hypot(xs / width, ys / height) / np.sqrt(2)
+    return np.clip(image * light[..., None], 0, 255).astype(np.uint8)
+
+
+def render(line_count, font_size, condition, noise):
+    """(BGR image, expected text, rendered line count) of one panel under condition"""
+    image, expected, rendered = make_panel(line_count, font_size, noise if condition == 'noisy' else 0)
+    bgr = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    if condition == 'photo':
+        bgr = photograph(bgr, noise)
+    return bgr, expected, rendered
+
+
+def word_accuracy(expected, actual):
+    return difflib.SequenceMatcher(None, expected.lower().split(), actual.lower().split()).ratio()
+
+
+def time_call(func, repeat):
+    durations = []
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Line-parallel OCR benchmark")
+    parser.add_argument('--lines', type=int, nargs='+', default=[10, 30, 60])
+    parser.add_argument('--font-size', type=int, default=28)
+    parser.add_argument('--workers', type=int, default=None, help="Line OCR threads (default: CPU count)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--conditions', nargs='+', choices=CONDITIONS, default=CONDITIONS)
+    parser.add_argument('--noise', type=float, default=15, help="Pixel noise sigma for noisy and photo panels")
+    args = parser.parse_args()
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        sys.exit(f"tesseract is required for this benchmark: {e}")
+
+    if args.workers:
+        ocr_engine.line_workers = args.workers
+
+    print(f"{'condition':<9} {'lines':>6} {'bands':>6} {'page s':>8} {'lines s':>8} {'speedup':>8} "
+          f"{'page acc':>9} {'line acc':>9}")
+    for condition, line_count in ((c, n) for c in args.conditions for n in args.lines):
+        bgr, expected, rendered = render(line_count, args.font_size, condition, args.noise)
+        bands = len(ocr_engine.segment_lines(PreprocessGraph(bgr, ocr_engine).get('resized_adaptive')))
+        gray = ocr_engine._resize_if_needed(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY))
+        binary = ocr_engine._adaptive_threshold(gray)
+
+        page_time, (page_text, _) = time_call(
+            lambda: ocr_engine._run_tesseract(binary, '--psm 6 -l eng'), args.repeat)
+
+        def run_lines():
+            result = {'partial': False}
+            ocr_engine._ocr_lines(PreprocessGraph(bgr, ocr_engine), result, 'eng', None)
+            return result.get('text', "")
+
+        lines_time, lines_text = time_call(run_lines, args.repeat)
+
+        print(f"{condition:<9} {rendered:>6} {bands:>6} {page_time:>8.2f} {lines_time:>8.2f} {page_time / lines_time:>7.2f}x "
+              f"{word_accuracy(expected, page_text):>9.2%} {word_accuracy(expected, lines_text):>9.2%}")
+
+
+if __name__ == "__main__":
+    main()
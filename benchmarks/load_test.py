@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test against a local RiskRead server.
+
+Starts the app (Werkzeug or the asyncio/ASGI runner) on a free port, waits
+for /ready, then drives a weighted mix of requests:
+  image    - POST /analyze with a synthetic label upload
+  text     - POST /analyze with pasted ingredient text
+  predict  - POST /api/predict for a single ingredient
+  api      - POST /api/analyze with raw image bytes
+Labels are rendered with ocr.synthetic at the given sizes and noise levels.
+
+Closed loop (--concurrency N): N clients send back to back.
+Open loop (--rate R): requests start at R/s whatever the latency; latency is
+measured from the scheduled start, so queueing delay is not hidden.
+
+The result caches are disabled on the started server (pass --keep-caches to
+keep them) so repeated labels are really analyzed every time.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 8 --duration 30
+    python benchmarks/load_test.py --rate 20 --mix image=1,text=3,predict=6 --sizes 800x600 1600x1200 --noise 0 20
+    python benchmarks/load_test.py --url http://localhost:5000 --concurrency 4
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import requests
+
+from ocr.synthetic import make_label_bytes
+
+INGREDIENTS = [
+    "water", "sugar", "wheat flour", "palm oil", "salt", "citric acid", "red 40",
+    "sodium benzoate", "natural flavors", "aspartame", "soy lecithin", "msg",
+    "high fructose corn syrup", "yellow 5", "modified corn starch", "xylitol",
+    "potassium sorbate", "cocoa butter", "skim milk powder", "dextrose",
+]
+
+SERVERS = {
+    'werkzeug': ("from app.app import app; from app.warmup import warm_up; warm_up(app); "
+                 "app.run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)"),
+    'asgi': "from app.asgi import serve; serve('127.0.0.1', {port})",
+}
+
+RESULT_MARKER = b"Analysis Report"   # only result.html contains it
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, keep_caches, log_path):
+    """Start the app in a subprocess; returns (process, base_url) once /ready answers 200"""
+    port = free_port()
+    env = dict(os.environ)
+    if not keep_caches:
+        env.update(RISKREAD_DEDUP='0', RISKREAD_TEXT_CACHE_SIZE='0')
+    log = open(log_path, 'w')
+    process = subprocess.Popen([sys.executable, '-c', SERVERS[kind].format(port=port)],
+                               cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited with code {process.returncode}, see {log_path}")
+        try:
+            if requests.get(f"{url}/ready", timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    sys.exit(f"Server did not become ready within 120s, see {log_path}")
+
+
+def random_label(rng):
+    ingredients = rng.sample(INGREDIENTS, rng.randint(4, 10))
+    lines = ["Ingredients:"]
+    for i in range(0, len(ingredients), 3):
+        lines.append(", ".join(ingredients[i:i + 3]) + ",")
+    return lines, ", ".join(ingredients)
+
+
+def make_payloads(sizes, noise_levels, count, seed):
+    """count synthetic label images per (size, noise), plus matching texts"""
+    rng = random.Random(seed)
+    images, texts = [], []
+    for width, height in sizes:
+        for noise in noise_levels:
+            for _ in range(count):
+                lines, text = random_label(rng)
+                font_size = max(12, height // (len(lines) * 2 + 2))
+                images.append(make_label_bytes(lines, size=(width, height), noise=noise,
+                                               font_size=font_size, seed=rng.randrange(1 << 30)))
+                texts.append(text)
+    return images, texts
+
+
+class Client:
+    """Sends one request of a given kind; returns (ok, status) and never raises"""
+
+    def __init__(self, url, images, texts, timeout):
+        self.url = url
+        self.images = images
+        self.texts = texts
+        self.timeout = timeout
+        self.local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def send(self, kind, rng):
+        try:
+            if kind == 'image':
+                files = {'image': ('label.png', rng.choice(self.images), 'image/png')}
+                response = self.session.post(f"{self.url}/analyze", files=files, timeout=self.timeout)
+                return response.status_code == 200 and RESULT_MARKER in response.content, response.status_code
+            if kind == 'text':
+                response = self.session.post(f"{self.url}/analyze", data={'ingredients': rng.choice(self.texts)},
+                                             timeout=self.timeout)
+                return response.status_code == 200 and RESULT_MARKER in response.content, response.status_code
+            if kind == 'predict':
+                response = self.session.post(f"{self.url}/api/predict", json={'ingredient': rng.choice(INGREDIENTS)},
+                                             timeout=self.timeout)
+                return response.status_code == 200, response.status_code
+            if kind == 'api':
+                response = self.session.post(f"{self.url}/api/analyze", data=rng.choice(self.images),
+                                             headers={'Content-Type': 'image/png'}, timeout=self.timeout)
+                return response.status_code == 200, response.status_code
+            raise ValueError(f"Unknown request kind: {kind}")
+        except requests.Timeout:
+            return False, 'timeout'
+        except requests.RequestException as e:
+            return False, type(e).__name__
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def record(self, kind, seconds, ok, status):
+        with self.lock:
+            self.latencies[kind].append(seconds)
+            if not ok:
+                self.errors[kind][str(status)] += 1
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_closed_loop(client, recorder, kinds, weights, concurrency, duration, seed):
+    stop_at = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        while time.perf_counter() < stop_at:
+            kind = rng.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            ok, status = client.send(kind, rng)
+            recorder.record(kind, time.perf_counter() - start, ok, status)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(client, recorder, kinds, weights, rate, duration, max_inflight, seed):
+    rng = random.Random(seed)
+    pool = ThreadPoolExecutor(max_workers=max_inflight)
+    inflight = threading.Semaphore(max_inflight)
+    start = time.perf_counter()
+    scheduled = start
+
+    def fire(kind, scheduled_at, request_rng):
+        try:
+            ok, status = client.send(kind, request_rng)
+            # From the scheduled start: time spent waiting for a free client slot counts too
+            recorder.record(kind, time.perf_counter() - scheduled_at, ok, status)
+        finally:
+            inflight.release()
+
+    while scheduled < start + duration:
+        # Poisson arrivals
+        scheduled += rng.expovariate(rate)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        kind = rng.choices(kinds, weights)[0]
+        inflight.acquire()
+        pool.submit(fire, kind, scheduled, random.Random(rng.random()))
+    pool.shutdown(wait=True)
+
+
+def report(recorder, elapsed):
+    rows = {}
+    print(f"\n{'endpoint':<10} {'requests':>8} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8}")
+    for kind in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[kind])
+        errors = sum(recorder.errors[kind].values())
+        rows[kind] = {
+            'requests': len(values),
+            'throughput': len(values) / elapsed,
+            'error_rate': errors / len(values),
+            'errors': dict(recorder.errors[kind]),
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000,
+        }
+        row = rows[kind]
+        print(f"{kind:<10} {row['requests']:>8} {row['throughput']:>8.2f} {row['error_rate']:>6.1%} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+        if row['errors']:
+            print(f"{'':<10} errors by status: {row['errors']}")
+    total = sum(row['requests'] for row in rows.values())
+    print(f"\nTotal: {total} requests in {elapsed:.1f}s ({total / elapsed:.2f} req/s)")
+    return rows
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        kind, _, weight = part.partition('=')
+        if kind.strip() not in ('image', 'text', 'predict', 'api'):
+            raise argparse.ArgumentTypeError(f"Unknown request kind: {kind}")
+        weights[kind.strip()] = float(weight or 1)
+    return weights
+
+
+def parse_size(size):
+    width, _, height = size.lower().partition('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a local RiskRead server")
+    parser.add_argument('--url', default=None, help="Target an already running server instead of starting one")
+    parser.add_argument('--server', default='werkzeug', choices=sorted(SERVERS))
+    parser.add_argument('--keep-caches', action='store_true', help="Leave duplicate/text result caches on")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('image=1,text=2,predict=3'),
+                        help="Weighted request kinds: image, text, predict, api (default image=1,text=2,predict=3)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Closed loop: number of concurrent clients")
+    parser.add_argument('--rate', type=float, default=None, help="Open loop: requests/second (overrides --concurrency)")
+    parser.add_argument('--max-inflight', type=int, default=256, help="Open loop: client-side cap on open requests")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of load")
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[(800, 600)], help="Label sizes, e.g. 800x600")
+    parser.add_argument('--noise', type=float, nargs='+', default=[0, 15], help="Gaussian noise levels (pixel std)")
+    parser.add_argument('--images', type=int, default=10, help="Distinct labels per size and noise level")
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    images, texts = make_payloads(args.sizes, args.noise, args.images, args.seed)
+    print(f"🖼️ {len(images)} synthetic labels ({', '.join(f'{w}x{h}' for w, h in args.sizes)}; noise {args.noise})")
+
+    process = None
+    url = args.url
+    if not url:
+        log_path = os.path.join(tempfile.gettempdir(), 'riskread_load_test_server.log')
+        print(f"🚀 Starting {args.server} server (log: {log_path})...")
+        process, url = start_server(args.server, args.keep_caches, log_path)
+
+    kinds, weights = list(args.mix), list(args.mix.values())
+    client = Client(url, images, texts, args.timeout)
+    recorder = Recorder()
+    mode = f"open loop at {args.rate:g} req/s" if args.rate else f"closed loop, {args.concurrency} clients"
+    print(f"🔥 {mode} for {args.duration:g}s against {url}, mix {args.mix}")
+    try:
+        start = time.perf_counter()
+        if args.rate:
+            run_open_loop(client, recorder, kinds, weights, args.rate, args.duration, args.max_inflight, args.seed)
+        else:
+            run_closed_loop(client, recorder, kinds, weights, args.concurrency, args.duration, args.seed)
+        elapsed = time.perf_counter() - start
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    rows = report(recorder, elapsed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': url, 'mode': mode, 'duration': elapsed, 'mix': args.mix, 'endpoints': rows}, f, indent=2)
+        print(f"   Report: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Vocabulary-constrained OCR vs plain tesseract.
+
+Renders synthetic ingredient panels from random names in data/ingredients.csv
+at several noise levels and runs OCREngine with vocab=False and vocab=True.
+Reports the median OCR time, the word-level similarity to the rendered text
+and how many output words PostProcessor's hardcoded corrections still touch.
+
+Usage:
+    python benchmarks/vocab_ocr.py
+    python benchmarks/vocab_ocr.py --noise 0 20 40 --labels 10 --mode lines
+"""
+import argparse
+import difflib
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp.post_processor import PostProcessor
+from ocr.build_vocabulary import load_ingredient_names
+from ocr.ocr_engine import ocr_engine, pytesseract
+from ocr.synthetic import make_label_bytes
+
+
+def make_labels(names, count, per_label, seed):
+    rng = random.Random(seed)
+    labels = []
+    for _ in range(count):
+        picked = rng.sample(names, per_label)
+        lines = ["Ingredients:"]
+        for i in range(0, len(picked), 3):
+            lines.append(", ".join(picked[i:i + 3]) + ",")
+        labels.append(lines)
+    return labels
+
+
+def word_accuracy(expected, actual):
+    return difflib.SequenceMatcher(None, expected.lower().split(), actual.lower().split()).ratio()
+
+
+def corrections_hit(text, post_processor):
+    lowered = text.lower() + ' '
+    return sum(lowered.count(wrong) for wrong in post_processor.ocr_corrections if wrong.strip())
+
+
+def run(labels, noise, vocab, mode):
+    durations, accuracies, corrections = [], [], 0
+    post_processor = PostProcessor()
+    for i, lines in enumerate(labels):
+        image_bytes = make_label_bytes(lines=lines, size=(900, 60 + 40 * len(lines)),
+                                       noise=noise, font_size=24, seed=i)
+        start = time.perf_counter()
+        result = ocr_engine.extract_text_detailed(image_bytes=image_bytes, mode=mode,
+                                                  vocab=vocab, crop_panel=False)
+        durations.append(time.perf_counter() - start)
+        accuracies.append(word_accuracy(" ".join(lines), result['text']))
+        corrections += corrections_hit(result['text'], post_processor)
+    return statistics.median(durations), statistics.mean(accuracies), corrections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vocabulary-constrained OCR benchmark")
+    parser.add_argument('--noise', type=int, nargs='+', default=[0, 25, 50])
+    parser.add_argument('--labels', type=int, default=8, help="Labels per noise level")
+    parser.add_argument('--per-label', type=int, default=9, help="Ingredients per label")
+    parser.add_argument('--mode', default='strategies', choices=['strategies', 'lines', 'refine'])
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        sys.exit(f"tesseract is required for this benchmark: {e}")
+    
+    # The quality gate would skip the noisiest labels; measure OCR itself
+    ocr_engine.quality_gate = False
+    labels = make_labels(load_ingredient_names(), args.labels, args.per_label, args.seed)
+    
+    print(f"{'noise':>6} {'plain s':>8} {'vocab s':>8} {'speedup':>8} "
+          f"{'plain acc':>10} {'vocab acc':>10} {'fixes':>10}")
+    for noise in args.noise:
+        plain_time, plain_acc, plain_fixes = run(labels, noise, False, args.mode)
+        vocab_time, vocab_acc, vocab_fixes = run(labels, noise, True, args.mode)
+        print(f"{noise:>6} {plain_time:>8.2f} {vocab_time:>8.2f} {plain_time / vocab_time:>7.2f}x "
+              f"{plain_acc:>10.2%} {vocab_acc:>10.2%} {plain_fixes:>4} -> {vocab_fixes:<4}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,18 @@
 import pickle
 import re
+import threading
 
 class IngredientClassifier:
     def __init__(self, model_path="ml/model.pkl"):
-        # Try to load model
-        try:
-            with open(model_path, "rb") as f:
-                self.model = pickle.load(f)
-            self.has_model = True
-            print("✅ ML model loaded successfully")
-        except Exception as e:
-            print(f"⚠️ Could not load model: {e}")
-            self.model = None
-            self.has_model = False
+        # The model is unpickled on first use (this imports sklearn), not at import time
+        self.model_path = model_path
+        self._model = None
+        self._model_loaded = False
+        self._model_lock = threading.Lock()
+        
+        # Bumped whenever the model or the override rules change, so
+        # cached predictions made with the old ones are not served
+        self.generation = 0
         
         # LABELS mapping
         self.LABELS = {
@@ -127,6 +127,41 @@ class IngredientClassifier:
             'soy lecithin': (1, "⚠️ Emulsifier, soy allergies common"),
         }
     
+    def load_model(self):
+        """Load the pickled model (once); returns True if a model is available"""
+        if self._model_loaded:
+            return self._model is not None
+        with self._model_lock:
+            if not self._model_loaded:
+                try:
+                    with open(self.model_path, "rb") as f:
+                        self._model = pickle.load(f)
+                    print("✅ ML model loaded successfully")
+                except Exception as e:
+                    print(f"⚠️ Could not load model: {e}")
+                    self._model = None
+                self._model_loaded = True
+        return self._model is not None
+    
+    def reload(self, model_path=None):
+        """Re-read the model file (e.g. after retraining) and invalidate cached predictions"""
+        with self._model_lock:
+            if model_path:
+                self.model_path = model_path
+            self._model = None
+            self._model_loaded = False
+            self.generation += 1
+        return self.load_model()
+    
+    @property
+    def model(self):
+        self.load_model()
+        return self._model
+    
+    @property
+    def has_model(self):
+        return self.load_model()
+    
     def predict_ingredient(self, ingredient):
         """Predict safety of an ingredient"""
         ingredient_lower = ingredient.lower().strip()
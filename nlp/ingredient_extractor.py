@@ -1,17 +1,14 @@
 import re
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
+# Where extract_ingredients always splits, whatever else clean_text does to the text:
+# commas, except inside [...] which clean_text drops whole. (';', '•' and line breaks
+# are turned into spaces by clean_text, so they join words rather than separate them.)
+SEGMENT_BOUNDARY = re.compile(r',(?![^\[\]]*\])')
 
 class IngredientExtractor:
     def __init__(self):
-        self.stop_words = set(stopwords.words('english'))
+        # NLTK stop words are loaded on first access (not used by extraction)
+        self._stop_words = None
         
         # Common ingredient separators
         self.separators = [',', ';', '\n', '•', ' and ', ' & ', ' or ']
@@ -31,6 +28,19 @@ class IngredientExtractor:
             'made of', 'composed of', 'consists of', 'including'
         ]
     
+    @property
+    def stop_words(self):
+        """English stop words from NLTK, downloaded on first use if missing"""
+        if self._stop_words is None:
+            import nltk
+            try:
+                nltk.data.find('corpora/stopwords')
+            except LookupError:
+                nltk.download('stopwords')
+            from nltk.corpus import stopwords
+            self._stop_words = set(stopwords.words('english'))
+        return self._stop_words
+    
     def clean_text(self, text):
         """Clean and normalize text"""
         if not text:
@@ -39,9 +49,10 @@ class IngredientExtractor:
         # Convert to lowercase
         text = text.lower()
         
-        # Remove common prefixes with colon
+        # Remove common prefixes with colon (also when a line break or extra space splits "made with")
         for prefix in self.prefixes:
-            text = re.sub(rf'{prefix}[:\s]*', '', text, flags=re.IGNORECASE)
+            pattern = r'\s+'.join(prefix.split())
+            text = re.sub(rf'{pattern}[:\s]*', '', text, flags=re.IGNORECASE)
         
         # Remove "less than X% of" pattern
         text = re.sub(r'less than\s*\d+%\s*of[:\s]*', '', text, flags=re.IGNORECASE)
@@ -71,16 +82,18 @@ class IngredientExtractor:
         
         return text
     
-    def extract_ingredients(self, text):
+    def extract_ingredients(self, text, verbose=True):
         """Extract individual ingredients from text - SIMPLE VERSION"""
         if not text or not text.strip():
             return []
         
-        print(f"NLP DEBUG: Original text: {text[:200]}...")
+        if verbose:
+            print(f"NLP DEBUG: Original text: {text[:200]}...")
         
         # Clean text
         cleaned_text = self.clean_text(text)
-        print(f"NLP DEBUG: Cleaned text: {cleaned_text[:200]}...")
+        if verbose:
+            print(f"NLP DEBUG: Cleaned text: {cleaned_text[:200]}...")
         
         # Replace major separators with commas
         # Removed '/' to preserve "Glucose/Fructose"
@@ -123,7 +136,8 @@ class IngredientExtractor:
                 seen.add(ing_lower)
                 unique_ingredients.append(ing)
         
-        print(f"NLP DEBUG: Extracted ingredients: {unique_ingredients}")
+        if verbose:
+            print(f"NLP DEBUG: Extracted ingredients: {unique_ingredients}")
         return unique_ingredients
     
     def is_gibberish(self, text):
@@ -158,18 +172,21 @@ class IngredientExtractor:
             
         return False
 
-    def extract_from_ocr(self, ocr_text):
+    def extract_from_ocr(self, ocr_text, verbose=True):
         """Specialized extraction for OCR text"""
         if not ocr_text or ocr_text.strip() == "No text detected":
-            print("NLP DEBUG: OCR returned no text")
+            if verbose:
+                print("NLP DEBUG: OCR returned no text")
             return []
         
         # Check for gibberish BEFORE any processing
         if self.is_gibberish(ocr_text):
-            print("NLP DEBUG: Text detected as gibberish! Skipping.")
+            if verbose:
+                print("NLP DEBUG: Text detected as gibberish! Skipping.")
             return []
             
-        print(f"NLP DEBUG: OCR text received: {ocr_text[:200]}...")
+        if verbose:
+            print(f"NLP DEBUG: OCR text received: {ocr_text[:200]}...")
         
         # Convert to lowercase
         text = ocr_text.lower()
@@ -185,9 +202,10 @@ class IngredientExtractor:
         
         # Note: Typo correction moved to post_processor.py
         
-        print(f"NLP DEBUG: Processed text: {text[:200]}...")
+        if verbose:
+            print(f"NLP DEBUG: Processed text: {text[:200]}...")
         
-        return self.extract_ingredients(text)
+        return self.extract_ingredients(text, verbose)
 
 # Create a global instance
 ingredient_extractor = IngredientExtractor()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Build the tesseract vocabulary files used by OCREngine's vocab option.
+
+Reads ingredient names from data/ingredients.csv and writes to ocr/vocabulary/:
+  ingredients.user-words     one word per line (lower, Title and UPPER case)
+  ingredients.user-patterns  E-numbers, percentages and other label tokens
+  whitelist.txt              characters tesseract is allowed to output
+
+Usage:
+    python -m ocr.build_vocabulary
+    python -m ocr.build_vocabulary --csv data/ingredients_improved.csv
+"""
+import argparse
+import csv
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV = os.path.join(BASE_DIR, 'data', 'ingredients.csv')
+VOCABULARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vocabulary')
+
+WORDS_FILE = 'ingredients.user-words'
+PATTERNS_FILE = 'ingredients.user-patterns'
+WHITELIST_FILE = 'whitelist.txt'
+
+# Words found on labels around the ingredient list
+LABEL_WORDS = [
+    'ingredients', 'ingredient', 'contains', 'contain', 'may', 'less', 'than', 'of',
+    'and', 'or', 'the', 'following', 'added', 'color', 'colour', 'colors', 'colours',
+    'flavor', 'flavour', 'flavors', 'flavours', 'natural', 'artificial', 'organic',
+    'preservative', 'preservatives', 'emulsifier', 'emulsifiers', 'stabilizer',
+    'thickener', 'acidity', 'regulator', 'antioxidant', 'sweetener', 'from', 'with',
+    'allergy', 'allergens', 'advice', 'for', 'see', 'in', 'bold', 'traces', 'made',
+]
+
+# Certified food colors as they appear on labels ("Red 40", "FD&C Yellow 5 Lake")
+COLOR_NAMES = [
+    'red 3', 'red 40', 'yellow 5', 'yellow 6', 'blue 1', 'blue 2', 'green 3',
+    'citrus red 2', 'orange b', 'fd&c', 'lake',
+]
+
+# Tesseract pattern syntax: \d digit, \c letter, \a lower, \A upper, \n alphanumeric
+PATTERNS = [
+    r'E\d\d\d',
+    r'E\d\d\d\a',
+    r'E\d\d\d\d',
+    r'E\d\d\d(\a)',
+    r'INS\d\d\d',
+    r'\d%',
+    r'\d\d%',
+    r'\d.\d%',
+    r'\d,\d%',
+    r'(\d%)',
+    r'(\d\d%)',
+]
+
+# Characters the corpus never uses but labels do. Quotes are left out because
+# pytesseract splits the config string with shlex.
+EXTRA_CHARACTERS = ':;%*[]'
+
+
+def load_ingredient_names(csv_path=DEFAULT_CSV):
+    """Ingredient names from the 'ingredient' column of the dataset"""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return [row['ingredient'] for row in csv.DictReader(f) if row.get('ingredient')]
+
+
+def build_words(names):
+    """Unique words from ingredient names, label words and color names, in case variants"""
+    words = set()
+    for name in list(names) + LABEL_WORDS + COLOR_NAMES:
+        for token in re.findall(r"[a-z0-9&]+", name.lower()):
+            # Single letters and bare numbers are left to the language model
+            if len(token) < 2 or token.isdigit():
+                continue
+            words.update((token, token.title(), token.upper()))
+    return sorted(words)
+
+
+def build_whitelist(names):
+    """Every character in the corpus, in both cases, plus label punctuation"""
+    characters = set()
+    for name in names:
+        characters.update(name.lower())
+        characters.update(name.upper())
+    characters.update('0123456789')
+    characters.update(EXTRA_CHARACTERS)
+    characters -= set(' \'"\\\t\n')
+    return ''.join(sorted(characters))
+
+
+def build_vocabulary(csv_path=DEFAULT_CSV, output_dir=VOCABULARY_DIR):
+    """Write the user-words, user-patterns and whitelist files; returns their paths"""
+    names = load_ingredient_names(csv_path)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    paths = {
+        'words': os.path.join(output_dir, WORDS_FILE),
+        'patterns': os.path.join(output_dir, PATTERNS_FILE),
+        'whitelist': os.path.join(output_dir, WHITELIST_FILE),
+    }
+    words = build_words(names)
+    with open(paths['words'], 'w', encoding='utf-8') as f:
+        f.write('\n'.join(words) + '\n')
+    with open(paths['patterns'], 'w', encoding='utf-8') as f:
+        f.write('\n'.join(PATTERNS) + '\n')
+    with open(paths['whitelist'], 'w', encoding='utf-8') as f:
+        f.write(build_whitelist(names) + '\n')
+    
+    print(f"✅ Vocabulary built from {len(names)} ingredients: {len(words)} words, "
+          f"{len(PATTERNS)} patterns -> {output_dir}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build tesseract vocabulary files from the ingredient dataset")
+    parser.add_argument('--csv', default=DEFAULT_CSV, help="Ingredient dataset (needs an 'ingredient' column)")
+    parser.add_argument('--output', default=VOCABULARY_DIR, help="Directory for the generated files")
+    args = parser.parse_args()
+    build_vocabulary(args.csv, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from perf.lazy import lazy_import
+from perf.metrics import metrics
+
+Image = lazy_import('PIL.Image')
+ImageSequence = lazy_import('PIL.ImageSequence')
+
+DEDUP_TOTAL = metrics.counter(
+    'riskread_dedup_total', 'Uploads checked against the duplicate upload index (hit, miss, error)', ['outcome'])
+DEDUP_SECONDS = metrics.histogram(
+    'riskread_dedup_seconds', 'Time to decode and digest an upload for the duplicate upload index',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+
+def pixel_digest(image, rows=256):
+    """SHA-256 of the size and grayscale pixels of every frame of a PIL image, hashed a strip at a time"""
+    digest = hashlib.sha256()
+    for frame in ImageSequence.Iterator(image):
+        gray = frame.convert('L')
+        digest.update(f"{gray.width}x{gray.height};".encode())
+        for top in range(0, gray.height, rows):
+            digest.update(gray.crop((0, top, gray.width, min(gray.height, top + rows))).tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint(image_path=None, image_bytes=None):
+    """Digest of the decoded pixels of an image file or raw bytes
+    
+    Every frame of a multi-page TIFF/GIF is decoded at full resolution, so
+    two documents sharing a cover page, or two labels whose ingredient
+    lists differ by one word, never share a fingerprint. Decoding costs
+    about 0.1 s for a 12 MP JPEG, against seconds of OCR.
+    """
+    with Image.open(image_path or io.BytesIO(image_bytes)) as image:
+        return pixel_digest(image)
+
+
+class DuplicateIndex:
+    """Earlier uploads by the digest of their decoded pixels
+    
+    Stores an arbitrary payload (OCR and prediction results) per image and
+    reuses it for an upload whose decoded pixels are identical in every
+    frame: the same file sent again, or a lossless re-encode or metadata
+    change of it. Lossy re-encodes and second photos of the same product
+    are deliberately not matched: on a label, a one-word ingredient change
+    can differ from the original by fewer pixels than a resized or
+    recompressed copy does, so a perceptual hash or pixel tolerance would
+    hand back another product's predictions. Entries also record the
+    classifier generation their predictions came from; lookups under a
+    newer generation (after classifier.reload()) do not see them.
+    RISKREAD_DEDUP=0 disables the index.
+    
+    Holds at most max_entries; the least recently used are evicted.
+    """
+    
+    def __init__(self, max_entries=5000):
+        self.enabled = os.environ.get('RISKREAD_DEDUP', '1') != '0'
+        self.max_entries = max_entries
+        self._entries = OrderedDict()     # digest -> (payload, generation)
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def fingerprint(self, image_path=None, image_bytes=None):
+        """Fingerprint of the image for lookup/add, or None if disabled or undecodable"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        try:
+            return fingerprint(image_path, image_bytes)
+        except Exception:
+            # Undecodable uploads fail again, with a proper message, in OCR
+            DEDUP_TOTAL.inc(outcome='error')
+            return None
+        finally:
+            DEDUP_SECONDS.observe(time.perf_counter() - start)
+    
+    def lookup(self, image_fingerprint, generation=0):
+        """Payload of the earlier upload with this fingerprint, added under generation, or None"""
+        if not self.enabled or image_fingerprint is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(image_fingerprint)
+            if entry is not None and entry[1] == generation:
+                self._entries.move_to_end(image_fingerprint)
+                payload = entry[0]
+            else:
+                payload = None
+        DEDUP_TOTAL.inc(outcome='hit' if payload is not None else 'miss')
+        return payload
+    
+    def add(self, image_fingerprint, payload, generation=0):
+        if not self.enabled or image_fingerprint is None:
+            return
+        with self._lock:
+            self._entries[image_fingerprint] = (payload, generation)
+            self._entries.move_to_end(image_fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Create a global instance
+upload_index = DuplicateIndex()
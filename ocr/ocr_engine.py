@@ -1,32 +1,164 @@
-import cv2
-import pytesseract
-import numpy as np
-from PIL import Image
 import io
+import math
 import os
+import re
+import shlex
+import sys
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Allow running this file directly (python ocr/ocr_engine.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from perf.lazy import lazy_import
+from perf.metrics import metrics
+from ocr.preprocess_graph import PreprocessGraph
+from ocr.text_regions import find_text_blocks, select_panel
+from ocr.build_vocabulary import VOCABULARY_DIR, WORDS_FILE, PATTERNS_FILE, WHITELIST_FILE
+
+
+def _configure_tesseract(module):
+    """Point pytesseract at the default install location on Windows"""
+    if os.name == 'nt':
+        module.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+
+# Heavy imports are deferred until the first image is processed
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+pytesseract = lazy_import('pytesseract', on_load=_configure_tesseract)
+Image = lazy_import('PIL.Image')
+
+OCR_STRATEGY_SECONDS = metrics.histogram(
+    'riskread_ocr_strategy_seconds', 'Time spent in one OCR strategy (preprocessing + tesseract)', ['strategy'])
+OCR_CONFIDENCE = metrics.histogram(
+    'riskread_ocr_confidence', 'Average word confidence of the winning OCR strategy',
+    buckets=(10, 20, 30, 40, 50, 60, 70, 80, 90, 100))
+OCR_STRATEGY_ERRORS = metrics.counter(
+    'riskread_ocr_strategy_errors_total', 'OCR strategies that raised an error', ['strategy'])
+OCR_INPUT_PIXELS = metrics.histogram(
+    'riskread_ocr_input_pixels', 'Pixels per image after reduced decode and size normalization',
+    buckets=(100_000, 250_000, 500_000, 1_000_000, 2_000_000, 4_000_000, 8_000_000, 16_000_000))
+OCR_STEP_SECONDS = metrics.histogram(
+    'riskread_ocr_step_seconds', 'Time spent in OCR pre-steps (panel detection, ...)', ['step'])
+OCR_PANEL_TOTAL = metrics.counter(
+    'riskread_ocr_panel_total', 'Ingredient panel detection outcomes', ['outcome'])
+OCR_PREPROCESS_PEAK_BYTES = metrics.histogram(
+    'riskread_ocr_preprocess_peak_bytes', 'Peak bytes of image buffers held by the preprocessing graph per image',
+    buckets=(1e6, 4e6, 16e6, 32e6, 64e6, 128e6, 256e6, 512e6))
+OCR_QUALITY_REJECTIONS = metrics.counter(
+    'riskread_ocr_quality_rejections_total', 'Images rejected by the pre-OCR quality gate', ['reason'])
+OCR_DESKEW_TOTAL = metrics.counter(
+    'riskread_ocr_deskew_total', 'Orientation/skew correction outcomes', ['outcome'])
+OCR_PAGES_TOTAL = metrics.counter(
+    'riskread_ocr_pages_total', 'Pages of multi-page images read or skipped after the ingredient section', ['outcome'])
+OCR_DEADLINE_TOTAL = metrics.counter(
+    'riskread_ocr_deadline_total', 'OCR strategies skipped or killed because the request deadline ran out', ['outcome'])
+OCR_TILED_TOTAL = metrics.counter(
+    'riskread_ocr_tiled_total', 'Images read in tiled mode, requested or chosen to stay under the memory ceiling', ['reason'])
+OCR_TILES = metrics.histogram(
+    'riskread_ocr_tiles', 'Bands per image read in tiled mode', buckets=(1, 2, 4, 8, 16, 32, 64))
+
+# Marks the page holding the ingredient list in multi-page documents
+INGREDIENT_HEADING = re.compile(r'ingr[eé]dient|made of', re.IGNORECASE)
+# Starts the section after the ingredient list (nutrition table, storage, maker, ...)
+INGREDIENTS_END = re.compile(
+    r'nutrition(al)?\s+(facts|information|declaration)|allergy\s+advice|storage|store\s+(in|at)|'
+    r'keep\s+refrigerated|best\s+before|use\s+by|directions|manufactured\s+(by|for)|distributed\s+by|'
+    r'produced\s+by|packed\s+by|net\s+(wt|weight)', re.IGNORECASE)
+
+# Whole-page OCR strategies in the order they are tried (strategy name -> preprocessing graph node)
+OCR_STRATEGIES = (
+    ('original', 'decoded'),
+    ('grayscale', 'gray'),
+    ('threshold', 'threshold'),
+    ('adaptive', 'adaptive'),
+)
 
 class OCREngine:
     def __init__(self):
-        # Configure Tesseract path
-        if os.name == 'nt':  # Windows
-            pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+        # Tesseract path is configured when pytesseract is first imported
         
         # Cache for frequently used configurations
         self.config_cache = {}
+        
+        # Moving average of seconds per strategy, used to skip strategies
+        # that cannot finish before a request deadline
+        self.strategy_costs = {}
+        
+        # Size normalization: bound the pixels every strategy has to process
+        self.max_pixels = 4_000_000       # ~4 MP after decode/normalization
+        self.target_text_height = 32      # px; tesseract reads 20-40 px text best
+        self.thumbnail_size = 512         # long side used for quick image statistics
+        
+        # Crop full-package photos to the "Ingredients:" block before OCR;
+        # smaller images (screenshots, close-ups) are read whole
+        self.crop_to_panel = True
+        self.panel_min_pixels = 1_000_000
+        # The heading is looked for in a strip this many text heights wide
+        # at the left of each text block, with text scaled to this height
+        self.heading_strip_width = 20
+        self.heading_text_height = 20
+        
+        # Thread pool size for line-level OCR (each line is one tesseract process)
+        self.line_workers = os.cpu_count() or 2
+        
+        # Pages of a multi-page TIFF/GIF processed at once (bounds memory too)
+        self.page_workers = min(4, os.cpu_count() or 2)
+        # Pages after the ingredient heading still read when no end-of-list marker shows up
+        self.section_max_pages = 2
+        
+        # Refine mode: lines with any word below this confidence are re-read
+        self.refine_threshold = 60
+        
+        # Pre-OCR quality gate: clearly hopeless images (blank, very blurry,
+        # no text-like shapes) are rejected before any tesseract call.
+        # Override the thresholds with RISKREAD_QUALITY_* env vars.
+        self.quality_gate = os.environ.get('RISKREAD_QUALITY_GATE', '1') != '0'
+        self.quality_thresholds = {
+            'min_contrast': float(os.environ.get('RISKREAD_QUALITY_MIN_CONTRAST', 32)),
+            'min_sharpness': float(os.environ.get('RISKREAD_QUALITY_MIN_SHARPNESS', 10)),
+            'min_text_blobs': int(os.environ.get('RISKREAD_QUALITY_MIN_TEXT_BLOBS', 4)),
+        }
+        
+        # Ingredient vocabulary (python -m ocr.build_vocabulary): user words,
+        # patterns and a character whitelist passed to tesseract. Off by default;
+        # enable per call with vocab=True or globally with RISKREAD_OCR_VOCAB=1.
+        self.use_vocabulary = os.environ.get('RISKREAD_OCR_VOCAB', '0') == '1'
+        self.vocabulary_dir = VOCABULARY_DIR
+        
+        # Skew correction before OCR, measured on a thumbnail. Small angles
+        # are left alone; RISKREAD_OCR_OSD=1 also runs tesseract orientation
+        # detection once at low resolution to fix 90/180/270 degree rotations.
+        self.deskew = os.environ.get('RISKREAD_OCR_DESKEW', '1') != '0'
+        self.deskew_osd = os.environ.get('RISKREAD_OCR_OSD', '0') == '1'
+        self.deskew_min_angle = 0.5       # degrees
+        self.deskew_max_angle = 30        # larger estimates are unreliable
+        
+        # Tiled mode: decode to grayscale and OCR overlapping horizontal bands
+        # so the image buffers of one request stay under memory_ceiling
+        # (RISKREAD_OCR_MEMORY_CEILING_MB). Uploads whose normal decode would
+        # not fit are tiled automatically.
+        self.memory_ceiling = int(float(os.environ.get('RISKREAD_OCR_MEMORY_CEILING_MB', 512)) * 1024 * 1024)
+        self.decode_bytes_per_pixel = 6   # normal decode: PIL RGB bitmap + BGR copy
+        self.tile_bytes_per_pixel = 6     # one band: thresholds + the copies handed to tesseract
+        self.tile_overlap_lines = 2       # band overlap, in text line heights
     
-    def preprocess_image(self, image_array, preprocessing_level='auto'):
-        """Enhanced preprocessing with multiple strategies"""
+    def preprocess_image(self, image_array, preprocessing_level='auto', graph=None):
+        """Enhanced preprocessing with multiple strategies
+        
+        Pass the request's PreprocessGraph to reuse intermediates (grayscale,
+        resized, ...) that other strategies already computed.
+        """
         try:
-            # Convert to grayscale
-            if len(image_array.shape) == 3:
-                gray = cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image_array
+            graph = graph or PreprocessGraph(image_array, self)
             
             # Quick check for image quality
             if preprocessing_level == 'auto':
-                # Calculate image sharpness using Laplacian variance
-                laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+                # Calculate image sharpness using Laplacian variance (on a thumbnail)
+                laplacian_var = graph.get('sharpness')
                 
                 # Determine preprocessing based on image quality
                 if laplacian_var < 100:  # Blurry image
@@ -39,36 +171,18 @@ class OCREngine:
             # Apply preprocessing based on level
             if preprocessing_level == 'minimal':
                 # Just resize and denoise
-                gray = self._resize_if_needed(gray)
-                gray = cv2.fastNlMeansDenoising(gray, h=10)
+                gray = graph.get('denoised')
                 
             elif preprocessing_level == 'moderate':
-                # Your current approach
-                gray = self._resize_if_needed(gray)
-                gray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                            cv2.THRESH_BINARY, 11, 2)
+                # Your current approach (resize + adaptive threshold)
+                gray = graph.get('resized_adaptive')
                 
             elif preprocessing_level == 'aggressive':
-                # For difficult images
-                gray = self._resize_if_needed(gray, min_height=1500)  # Larger upscale
+                # For difficult images: larger upscale, denoise, sharpen, threshold
+                gray = graph.get('aggressive')
                 
-                # Remove noise
-                gray = cv2.medianBlur(gray, 3)
-                
-                # Sharpen image
-                kernel = np.array([[-1,-1,-1],
-                                   [-1, 9,-1],
-                                   [-1,-1,-1]])
-                gray = cv2.filter2D(gray, -1, kernel)
-                
-                # Morphological operations to enhance text
-                kernel = np.ones((1, 1), np.uint8)
-                gray = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
-                gray = cv2.morphologyEx(gray, cv2.MORPH_OPEN, kernel)
-                
-                # Thresholding
-                gray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                            cv2.THRESH_BINARY, 15, 3)
+            else:
+                gray = graph.get('gray')
             
             return gray, preprocessing_level
             
@@ -76,81 +190,1084 @@ class OCREngine:
             print(f"Preprocessing error: {e}")
             return image_array, 'error'
     
+    def _aggressive_filter(self, gray):
+        """Denoise, sharpen and threshold a grayscale image (no resizing)"""
+        # Remove noise
+        gray = cv2.medianBlur(gray, 3)
+        
+        # Sharpen image
+        kernel = np.array([[-1,-1,-1],
+                           [-1, 9,-1],
+                           [-1,-1,-1]])
+        gray = cv2.filter2D(gray, -1, kernel)
+        
+        # Morphological operations to enhance text
+        kernel = np.ones((1, 1), np.uint8)
+        gray = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
+        gray = cv2.morphologyEx(gray, cv2.MORPH_OPEN, kernel)
+        
+        # Thresholding
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, 15, 3)
+    
     def _resize_if_needed(self, gray, min_height=1000):
-        """Resize image if too small"""
+        """Resize image if too small, without exceeding the pixel budget"""
         height, width = gray.shape
+        scale_factor = 1.0
         if height < min_height:
             scale_factor = min_height / height
+        # Never produce more than max_pixels (this also shrinks oversized inputs)
+        if width * height * scale_factor ** 2 > self.max_pixels:
+            scale_factor = math.sqrt(self.max_pixels / (width * height))
+        if scale_factor != 1.0:
             new_height = int(height * scale_factor)
             new_width = int(width * scale_factor)
-            gray = cv2.resize(gray, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+            interpolation = cv2.INTER_CUBIC if scale_factor > 1 else cv2.INTER_AREA
+            gray = cv2.resize(gray, (new_width, new_height), interpolation=interpolation)
         return gray
     
-    def extract_text(self, image_path=None, image_bytes=None, psm_mode=6, 
-                     language='eng', preprocessing_level='auto'):
-        """Enhanced text extraction with multiple strategies"""
+    def _thumbnail(self, image, size=None):
+        """Downscaled copy (long side <= size) for cheap image statistics"""
+        size = size or self.thumbnail_size
+        height, width = image.shape[:2]
+        scale = size / max(height, width)
+        if scale >= 1:
+            return image
+        return cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+    
+    def _sharpness(self, gray):
+        """Laplacian variance of a thumbnail (higher = sharper)"""
+        return cv2.Laplacian(self._thumbnail(gray), cv2.CV_64F).var()
+    
+    def _estimate_text_height(self, img):
+        """Median height in pixels of character-sized blobs, or None if unsure"""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
+        thumb = self._thumbnail(gray, 1024)
+        scale = gray.shape[0] / thumb.shape[0]
+        _, binary = cv2.threshold(thumb, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if count < 2:
+            return None
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        # Character-like blobs: not specks, not lines/borders/photos
+        mask = (heights >= 4) & (heights < thumb.shape[0] * 0.2) & (widths < thumb.shape[1] * 0.2)
+        if mask.sum() < 10:
+            return None
+        return float(np.median(heights[mask])) * scale
+    
+    def assess_quality(self, graph):
+        """Score contrast, sharpness and text density
+        
+        Contrast is the grey-level spread of the full image, ignoring the
+        darkest/brightest 0.01% of pixels, so a few lines of small text on
+        a large white label still count. Sharpness and text blobs are
+        measured on a 1024 px thumbnail. Returns {'ok': bool, 'reason':
+        None or 'blank'/'blurry'/'no_text', 'scores': {...}}.
+        """
+        start = time.perf_counter()
+        gray = graph.get('gray')
+        thumb = self._thumbnail(gray, 1024)
+        thresholds = self.quality_thresholds
+        
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        cumulative = np.cumsum(hist) / hist.sum()
+        spread = np.searchsorted(cumulative, 0.9999) - np.searchsorted(cumulative, 0.0001)
+        scores = {'contrast': float(spread), 'sharpness': float(cv2.Laplacian(thumb, cv2.CV_64F).var())}
+        
+        # Text density: character-sized blobs after Otsu binarization
+        _, binary = cv2.threshold(thumb, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        char_like = (heights >= 3) & (heights < thumb.shape[0] * 0.25) & (widths < thumb.shape[1] * 0.25)
+        scores['text_blobs'] = int(char_like.sum())
+        scores['text_density'] = float(stats[1:, cv2.CC_STAT_AREA][char_like].sum()) / thumb.size
+        
+        reason = None
+        if scores['contrast'] < thresholds['min_contrast']:
+            reason = 'blank'
+        elif scores['sharpness'] < thresholds['min_sharpness']:
+            reason = 'blurry'
+        elif scores['text_blobs'] < thresholds['min_text_blobs']:
+            reason = 'no_text'
+        
+        OCR_STEP_SECONDS.observe(time.perf_counter() - start, step='quality')
+        return {'ok': reason is None, 'reason': reason, 'scores': scores}
+    
+    def estimate_skew(self, gray):
+        """Skew angle in degrees of the text lines in `gray`, or None if unsure
+        
+        Characters on a thumbnail are smeared into line blobs, and the
+        median minAreaRect angle of the elongated blobs is the page skew.
+        Positive angles mean the text rises to the right.
+        """
+        thumb = self._thumbnail(gray, 1024)
+        _, binary = cv2.threshold(thumb, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, thumb.shape[1] // 50), 3))
+        lines = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        angles = []
+        weights = []
+        for contour in contours:
+            (_, _), (w, h), angle = cv2.minAreaRect(contour)
+            # Angle of the long side, in [-90, 90)
+            if w < h:
+                w, h = h, w
+                angle -= 90
+            angle = (angle + 90) % 180 - 90
+            if w < 4 * h or w < thumb.shape[1] * 0.05:
+                continue
+            angles.append(angle)
+            weights.append(w)
+        if len(angles) < 3:
+            return None
+        
+        # Weighted median: long lines dominate short fragments
+        order = np.argsort(angles)
+        cumulative = np.cumsum(np.array(weights)[order])
+        median = float(np.array(angles)[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+        # minAreaRect angles are clockwise in image coordinates
+        return -median
+    
+    def detect_orientation(self, gray, deadline=None):
+        """Clockwise rotation (0/90/180/270) tesseract OSD suggests, or 0 if unsure"""
+        # timeout=0 means no timeout to pytesseract, so an expired deadline must not get that far
+        timeout = deadline.remaining() if deadline else 0
+        if deadline and timeout <= 0:
+            raise RuntimeError('Tesseract process timeout')
+        thumb = self._thumbnail(gray, 1024)
+        osd = pytesseract.image_to_osd(thumb, config='--psm 0', timeout=timeout,
+                                       output_type=pytesseract.Output.DICT)
+        if float(osd.get('orientation_conf', 0)) < 2:
+            return 0
+        return int(osd.get('rotate', 0)) % 360
+    
+    def correct_orientation(self, graph, deadline=None, osd=None):
+        """Rotate the image upright and level before the strategy loop
+        
+        Returns (graph, {'rotate': degrees clockwise, 'skew': degrees}); the
+        original graph is returned untouched when no correction is needed.
+        """
+        osd = self.deskew_osd if osd is None else osd
+        info = {'rotate': 0, 'skew': 0.0}
+        image = graph.get('decoded')
+        gray = graph.get('gray')
+        
+        if osd:
+            start = time.perf_counter()
+            try:
+                info['rotate'] = self.detect_orientation(gray, deadline)
+            except Exception as e:
+                print(f"Orientation detection failed: {e}")
+            finally:
+                OCR_STEP_SECONDS.observe(time.perf_counter() - start, step='osd')
+            if info['rotate']:
+                rotations = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180,
+                             270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+                image = cv2.rotate(image, rotations[info['rotate']])
+                gray = cv2.rotate(gray, rotations[info['rotate']])
+                OCR_DESKEW_TOTAL.inc(outcome='rotated')
+        
+        start = time.perf_counter()
+        angle = self.estimate_skew(gray)
+        if angle is not None and self.deskew_min_angle <= abs(angle) <= self.deskew_max_angle:
+            height, width = image.shape[:2]
+            matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+            image = cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_REPLICATE)
+            info['skew'] = round(angle, 2)
+            OCR_DESKEW_TOTAL.inc(outcome='deskewed')
+        elif not info['rotate']:
+            OCR_DESKEW_TOTAL.inc(outcome='straight' if angle is not None else 'unknown')
+        OCR_STEP_SECONDS.observe(time.perf_counter() - start, step='deskew')
+        
+        if not info['rotate'] and not info['skew']:
+            return graph, info
+        return PreprocessGraph(image, self), info
+    
+    def _reduction_factor(self, width, height):
+        """Largest 2/4/8 decode reduction that still leaves at least max_pixels"""
+        for factor in (8, 4, 2):
+            if width * height / (factor * factor) >= self.max_pixels:
+                return factor
+        return 1
+    
+    def _normalize_size(self, img):
+        """Downscale so text is near target_text_height and pixels <= max_pixels
+        
+        Small images are left alone; upscaling is done by preprocess_image.
+        """
+        height, width = img.shape[:2]
+        scale = 1.0
+        text_height = self._estimate_text_height(img)
+        if text_height and text_height > 2 * self.target_text_height:
+            scale = self.target_text_height / text_height
+        if width * height * scale ** 2 > self.max_pixels:
+            scale = math.sqrt(self.max_pixels / (width * height))
+        if scale < 1.0:
+            img = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        OCR_INPUT_PIXELS.observe(img.shape[0] * img.shape[1])
+        return img
+    
+    def _load_image(self, image_path=None, image_bytes=None):
+        """Decode an image file or raw bytes to a size-normalized BGR array
+        
+        Large photos are decoded at reduced resolution (libjpeg DCT scaling
+        via cv2.IMREAD_REDUCED_* or PIL draft) so the full-size bitmap is
+        never materialized. Returns None if the image cannot be read.
+        """
+        if image_path:
+            try:
+                # Only reads the header
+                with Image.open(image_path) as probe:
+                    factor = self._reduction_factor(*probe.size)
+            except Exception:
+                factor = 1
+            flag = getattr(cv2, f'IMREAD_REDUCED_COLOR_{factor}') if factor > 1 else cv2.IMREAD_COLOR
+            img = cv2.imread(image_path, flag)
+        else:
+            image = Image.open(io.BytesIO(image_bytes))
+            factor = self._reduction_factor(*image.size)
+            if factor > 1 and image.format == 'JPEG':
+                image.draft('RGB', (image.width // factor, image.height // factor))
+            img = cv2.cvtColor(np.array(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+        if img is None:
+            return None
+        return self._normalize_size(img)
+    
+    def _image_size(self, image_path=None, image_bytes=None):
+        """(width, height, format) from the image header, or None if it cannot be read"""
+        try:
+            with Image.open(image_path or io.BytesIO(image_bytes)) as probe:
+                return probe.size[0], probe.size[1], probe.format
+        except Exception:
+            return None
+    
+    def _exceeds_memory_ceiling(self, image_path=None, image_bytes=None):
+        """True if _load_image would hold more than memory_ceiling bytes while decoding"""
+        size = self._image_size(image_path, image_bytes)
+        if not size or not self.memory_ceiling:
+            return False
+        width, height, image_format = size
+        pixels = width * height
+        if image_format == 'JPEG':
+            # Only JPEG decodes at reduced resolution; other formats are decoded whole first
+            pixels /= self._reduction_factor(width, height) ** 2
+        return pixels * self.decode_bytes_per_pixel > self.memory_ceiling
+    
+    def _decode_gray(self, image_path=None, image_bytes=None):
+        """Decode straight to one byte per pixel, reduced 2/4/8x if needed to fit half the memory ceiling
+        
+        JPEG is reduced during decoding; other formats are decoded at full
+        size (still one byte per pixel) and then reduced.
+        """
+        size = self._image_size(image_path, image_bytes)
+        factor = 1
+        if size and self.memory_ceiling:
+            for factor in (1, 2, 4, 8):
+                if size[0] * size[1] / (factor * factor) <= self.memory_ceiling / 2:
+                    break
+        flag = getattr(cv2, f'IMREAD_REDUCED_GRAYSCALE_{factor}') if factor > 1 else cv2.IMREAD_GRAYSCALE
+        if image_path:
+            gray = cv2.imread(image_path, flag)
+        else:
+            gray = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+        if gray is None:
+            # Formats OpenCV cannot read (GIF, ...)
+            with Image.open(image_path or io.BytesIO(image_bytes)) as image:
+                gray = np.array(image.convert('L'))
+        return gray
+    
+    def tesseract_config(self, psm_mode, language='eng', vocab=False):
+        """Tesseract command-line config, optionally constrained to the ingredient vocabulary"""
+        key = (psm_mode, language, vocab)
+        if key in self.config_cache:
+            return self.config_cache[key]
+        
+        config = f'--psm {psm_mode} -l {language}'
+        if vocab:
+            words = os.path.join(self.vocabulary_dir, WORDS_FILE)
+            patterns = os.path.join(self.vocabulary_dir, PATTERNS_FILE)
+            whitelist = os.path.join(self.vocabulary_dir, WHITELIST_FILE)
+            if all(os.path.exists(path) for path in (words, patterns, whitelist)):
+                with open(whitelist, encoding='utf-8') as f:
+                    characters = f.read().strip()
+                # pytesseract splits the config with shlex: paths may contain spaces
+                config += (f' --user-words {shlex.quote(words)} --user-patterns {shlex.quote(patterns)}'
+                           f' -c {shlex.quote("tessedit_char_whitelist=" + characters)}')
+            else:
+                print(f"OCR vocabulary not found in {self.vocabulary_dir}, "
+                      f"run 'python -m ocr.build_vocabulary'")
+        
+        self.config_cache[key] = config
+        return config
+    
+    def _tesseract_data(self, processed, config, deadline=None):
+        """Word-level tesseract output (pytesseract DICT: text, conf, boxes, line ids)"""
+        timeout = deadline.remaining() if deadline else 0
+        if deadline and timeout <= 0:
+            raise RuntimeError('Tesseract process timeout')
+        return pytesseract.image_to_data(processed, config=config, timeout=timeout,
+                                         output_type=pytesseract.Output.DICT)
+    
+    def _run_tesseract(self, processed, config, deadline=None):
+        """Run tesseract on one image; returns (text, average confidence)
+        
+        With a deadline, the tesseract subprocess is killed when the budget
+        runs out (pytesseract raises RuntimeError in that case).
+        """
+        data = self._tesseract_data(processed, config, deadline)
+        
+        # Calculate confidence (-1 marks non-word boxes)
+        confidences = [float(conf) for conf in data['conf'] if float(conf) >= 0]
+        if not confidences:
+            return "", 0
+        
+        # Extract text
+        text = ' '.join([word for word in data['text'] if word.strip()])
+        return text, sum(confidences) / len(confidences)
+    
+    def _find_ingredient_keyword(self, gray, blocks, deadline=None):
+        """Box of the 'Ingredients' / 'Made of' heading at the start of a line of one of the text blocks
+        
+        Only the left edge of each block (heading_strip_width text heights
+        wide) is read, scaled down to heading_text_height: the strips are
+        stacked into one image for a single sparse tesseract pass. A heading
+        in the middle of a line is not found, and the whole image is read.
+        """
+        if not blocks:
+            return None
+        text_height = self._estimate_text_height(gray) or self.target_text_height
+        scale = min(1.0, self.heading_text_height / text_height)
+        strips, offsets, height = [], [], 0
+        for x, y, w, h in blocks:
+            strip = gray[y:y + h, x:x + min(w, int(self.heading_strip_width * text_height))]
+            if scale < 1.0:
+                strip = cv2.resize(strip, (max(1, int(strip.shape[1] * scale)), max(1, int(strip.shape[0] * scale))),
+                                   interpolation=cv2.INTER_AREA)
+            strips.append(strip)
+            offsets.append(height)
+            height += strip.shape[0] + 2 * self.heading_text_height
+        mosaic = np.full((height, max(strip.shape[1] for strip in strips)), 255, dtype=np.uint8)
+        for strip, offset in zip(strips, offsets):
+            mosaic[offset:offset + strip.shape[0], :strip.shape[1]] = strip
+        
+        data = self._tesseract_data(mosaic, '--psm 11 -l eng', deadline)
+        words = [word.strip().lower() for word in data['text']]
+        for i, word in enumerate(words):
+            if re.match(r'ingr[eé]dient', word) or (word == 'made' and i + 1 < len(words) and words[i + 1].startswith('of')):
+                index = max(0, bisect_right(offsets, data['top'][i]) - 1)
+                x, y = blocks[index][:2]
+                return (x + int(data['left'][i] / scale), y + int((data['top'][i] - offsets[index]) / scale),
+                        int(data['width'][i] / scale), int(data['height'][i] / scale))
+        return None
+    
+    def crop_to_ingredient_panel(self, graph, deadline=None):
+        """Crop to the text block that starts at the ingredient heading
+        
+        Text blocks come from an OpenCV-only locator (text_regions); one
+        tesseract pass over the start of their lines finds which block
+        holds the heading.
+        Takes and returns a PreprocessGraph: (cropped graph, (x, y, w, h)),
+        or (graph, None) if no panel was found.
+        """
+        start = time.perf_counter()
+        try:
+            gray = graph.get('gray')
+            blocks = find_text_blocks(gray)
+            keyword = self._find_ingredient_keyword(gray, blocks, deadline)
+            box = select_panel(blocks, keyword, gray.shape) if keyword else None
+            if box is None:
+                OCR_PANEL_TOTAL.inc(outcome='not_found')
+                return graph, None
+            OCR_PANEL_TOTAL.inc(outcome='cropped')
+            return graph.crop(box), box
+        finally:
+            OCR_STEP_SECONDS.observe(time.perf_counter() - start, step='panel')
+    
+    def _record_strategy_cost(self, strategy_name, seconds):
+        """Keep a moving average of how long each strategy takes"""
+        previous = self.strategy_costs.get(strategy_name)
+        self.strategy_costs[strategy_name] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+    
+    def extract_text_detailed(self, image_path=None, image_bytes=None, psm_mode=6,
+                              language='eng', preprocessing_level='auto', deadline=None,
+                              crop_panel=None, mode='strategies', vocab=None, deskew=None, on_line=None):
+        """Run OCR and return a result dict
+        
+        Keys: text, confidence, strategy (the winner), region (the ingredient
+        panel box OCR ran on, or None for the whole image), partial (True
+        when the deadline cut the run short) and error. When the quality
+        gate rejects the image, 'rejected' holds the reason and no OCR runs.
+        crop_panel defaults to self.crop_to_panel, vocab (constrain
+        tesseract to the ingredient vocabulary) to self.use_vocabulary and
+        deskew (level rotated/skewed photos first) to self.deskew; the
+        applied correction is reported under 'orientation'.
+        
+        Modes:
+          'strategies' - whole-page OCR with every preprocessing strategy,
+                         keeping the most confident one
+          'lines'      - split the page into text lines and OCR them in
+                         parallel (adds a 'lines' list to the result);
+                         on_line, if given, is called with each line dict
+                         in reading order as soon as it has been read
+          'refine'     - one cheap grayscale pass, then re-OCR only the
+                         low-confidence lines with aggressive preprocessing
+          'tiles'      - grayscale decode, OCR of overlapping bands within
+                         self.memory_ceiling (see _extract_tiled); chosen
+                         automatically in 'strategies' mode for uploads
+                         too large to decode whole under the ceiling
+        
+        With a deadline, work whose typical cost does not fit in the
+        remaining budget is skipped and a running tesseract call is killed
+        when it expires; the best result so far is returned.
+        
+        Multi-page TIFF/GIF files are read page by page (see extract_pages)
+        and merged; the per-page results are kept under 'pages'.
+        """
+        result = self._new_result()
         try:
             # Load image
-            if image_path:
-                img = cv2.imread(image_path)
-                if img is None:
-                    return "Error: Could not read image file"
-            elif image_bytes:
-                image = Image.open(io.BytesIO(image_bytes))
-                img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            if not image_path and not image_bytes:
+                result['error'] = "Error: No image provided"
+                return result
+            
+            # Multi-page TIFF/GIF: OCR every page and merge them
+            if self.count_frames(image_path, image_bytes) > 1:
+                pages = []
+                for page in self.extract_pages(image_path, image_bytes, psm_mode=psm_mode,
+                                               language=language, preprocessing_level=preprocessing_level,
+                                               deadline=deadline, crop_panel=crop_panel, mode=mode,
+                                               vocab=vocab, deskew=deskew):
+                    pages.append(page)
+                    # Pages run in parallel; their lines are reported in page order
+                    if on_line:
+                        for line in page.get('lines', []):
+                            on_line(line)
+                return self.merge_pages(pages)
+            
+            if mode == 'strategies' and self._exceeds_memory_ceiling(image_path, image_bytes):
+                OCR_TILED_TOTAL.inc(reason='memory_ceiling')
+                mode = 'tiles'
+            elif mode == 'tiles':
+                OCR_TILED_TOTAL.inc(reason='requested')
+            if mode == 'tiles':
+                return self._extract_tiled(image_path, image_bytes, psm_mode=psm_mode, language=language,
+                                           deadline=deadline, vocab=vocab)
+            
+            img = self._load_image(image_path, image_bytes)
+            if img is None:
+                result['error'] = "Error: Could not read image file"
+                return result
+        except Exception as e:
+            result['error'] = f"OCR Error: {str(e)}"
+            return result
+        
+        return self._extract_image(img, psm_mode=psm_mode, language=language,
+                                   preprocessing_level=preprocessing_level, deadline=deadline,
+                                   crop_panel=crop_panel, mode=mode, vocab=vocab, deskew=deskew,
+                                   on_line=on_line)
+    
+    @staticmethod
+    def _new_result():
+        return {'text': "", 'confidence': 0, 'strategy': None, 'region': None,
+                'partial': False, 'error': None}
+    
+    def _extract_image(self, img, psm_mode=6, language='eng', preprocessing_level='auto',
+                       deadline=None, crop_panel=None, mode='strategies', vocab=None, deskew=None,
+                       on_line=None):
+        """OCR one decoded BGR image (see extract_text_detailed for the options)"""
+        result = self._new_result()
+        try:
+            # Every intermediate (grayscale, thresholds, ...) is computed once per image
+            graph = PreprocessGraph(img, self)
+            
+            # Reject hopeless images before spending seconds in tesseract
+            if self.quality_gate:
+                quality = self.assess_quality(graph)
+                result['quality'] = quality['scores']
+                if not quality['ok']:
+                    result['rejected'] = quality['reason']
+                    OCR_QUALITY_REJECTIONS.inc(reason=quality['reason'])
+                    print(f"OCR quality gate rejected image ({quality['reason']}): "
+                          f"scores={quality['scores']} thresholds={self.quality_thresholds}")
+                    return result
+            
+            # Level skewed photos once so every strategy reads straight lines
+            if deskew is None:
+                deskew = self.deskew
+            if deskew:
+                try:
+                    graph, result['orientation'] = self.correct_orientation(graph, deadline)
+                except Exception as e:
+                    print(f"Deskew failed, using image as is: {e}")
+            
+            # Only OCR the ingredient panel of full-package photos
+            if crop_panel is None:
+                crop_panel = self.crop_to_panel
+            if crop_panel and img.shape[0] * img.shape[1] >= self.panel_min_pixels:
+                try:
+                    graph, result['region'] = self.crop_to_ingredient_panel(graph, deadline)
+                except Exception as e:
+                    print(f"Panel detection failed, using whole image: {e}")
+            
+            if vocab is None:
+                vocab = self.use_vocabulary
+            if mode == 'lines':
+                self._ocr_lines(graph, result, language, deadline, vocab=vocab, on_line=on_line)
+            elif mode == 'refine':
+                self._ocr_refine(graph, result, psm_mode, language, deadline, vocab=vocab)
             else:
-                return "Error: No image provided"
+                self._ocr_strategies(graph, result, psm_mode, language, deadline, vocab=vocab)
+            
+            result['preprocess_peak_bytes'] = graph.peak_bytes
+            OCR_PREPROCESS_PEAK_BYTES.observe(graph.peak_bytes)
+            if result['text']:
+                OCR_CONFIDENCE.observe(result['confidence'])
+            return result
+        
+        except Exception as e:
+            result['error'] = f"OCR Error: {str(e)}"
+            return result
+    
+    def count_frames(self, image_path=None, image_bytes=None):
+        """Number of frames/pages in the image (1 for single-frame formats); reads the header only"""
+        try:
+            with Image.open(image_path or io.BytesIO(image_bytes)) as probe:
+                return getattr(probe, 'n_frames', 1)
+        except Exception:
+            return 1
+    
+    def iter_frames(self, image_path=None, image_bytes=None):
+        """Yield (index, BGR array) per frame, decoding one frame at a time"""
+        with Image.open(image_path or io.BytesIO(image_bytes)) as image:
+            for index in range(getattr(image, 'n_frames', 1)):
+                image.seek(index)
+                frame = cv2.cvtColor(np.array(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+                yield index, self._normalize_size(frame)
+    
+    def _extract_page(self, index, frame, options):
+        page = self._extract_image(frame, **options)
+        page['page'] = index
+        return page
+    
+    def extract_pages(self, image_path=None, image_bytes=None, deadline=None, max_workers=None,
+                      stop_at_ingredients=True, **options):
+        """OCR the pages of a multi-page TIFF/GIF, yielding each page's result in page order
+        
+        Frames are decoded lazily and at most max_workers pages (default
+        self.page_workers) are in flight, so memory stays bounded by a few
+        pages whatever the page count. Each result carries its 'page'
+        index and, for pages holding part of the ingredient list, that part
+        as 'section' (see ingredient_section). Once the list has ended (an
+        end-of-list marker, or section_max_pages pages past the heading),
+        no further pages are started; pages already in flight still finish.
+        """
+        workers = max_workers or self.page_workers
+        total = self.count_frames(image_path, image_bytes)
+        frames = self.iter_frames(image_path, image_bytes)
+        pending = deque()
+        found = False
+        in_section = False       # the ingredient list started on an earlier page and has not ended
+        section_done = False
+        continued_pages = 0
+        processed = 0
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            def submit_next():
+                if found or (deadline and deadline.expired()):
+                    return
+                frame = next(frames, None)
+                if frame is not None:
+                    pending.append(pool.submit(self._extract_page, frame[0], frame[1],
+                                               dict(options, deadline=deadline)))
             
-            # Try multiple preprocessing strategies if first attempt fails
-            strategies = [
-                ('original', lambda x: x),
-                ('grayscale', lambda x: cv2.cvtColor(x, cv2.COLOR_BGR2GRAY) if len(x.shape) == 3 else x),
-                ('threshold', self._simple_threshold),
-                ('adaptive', lambda x: self._adaptive_threshold(x)),
-            ]
+            for _ in range(workers):
+                submit_next()
+            while pending:
+                page = pending.popleft().result()
+                processed += 1
+                section = None if section_done else self.ingredient_section(page['text'], in_section)
+                if section is not None:
+                    page['section'], ended = section
+                    continued_pages += in_section
+                    section_done = ended or continued_pages >= self.section_max_pages
+                    in_section = not section_done
+                    found = stop_at_ingredients and section_done
+                submit_next()
+                yield page
+        
+        frames.close()
+        OCR_PAGES_TOTAL.inc(processed, outcome='read')
+        if total > processed:
+            OCR_PAGES_TOTAL.inc(total - processed, outcome='skipped')
+    
+    def ingredient_section(self, text, continued=False):
+        """(part of text in the ingredient list, whether the list ends on this page), or None
+        
+        A page starts the section at its ingredient heading; with continued
+        (the list began on an earlier page) it starts at the top. The
+        section ends at the first end-of-list marker after its start.
+        """
+        start = body = 0
+        if not continued:
+            heading = INGREDIENT_HEADING.search(text)
+            if heading is None:
+                return None
+            start, body = heading.start(), heading.end()
+        end = INGREDIENTS_END.search(text, body)
+        return text[start:end.start() if end else len(text)].strip(), end is not None
+    
+    def merge_pages(self, pages):
+        """Combine per-page results into one result dict ('pages' holds the page results)
+        
+        'section' is the ingredient list joined across the pages that hold
+        part of it, or "" when no page had an ingredient heading.
+        """
+        result = self._new_result()
+        result['pages'] = pages
+        result['section'] = ' '.join(page['section'] for page in pages if page.get('section'))
+        read = [page for page in pages if page['text']]
+        if read:
+            # Weight each page's confidence by its length
+            total_chars = sum(len(page['text']) for page in read)
+            result['text'] = ' '.join(page['text'] for page in read)
+            result['confidence'] = sum(page['confidence'] * len(page['text']) for page in read) / total_chars
+            result['strategy'] = 'pages'
+        result['partial'] = any(page['partial'] for page in pages)
+        if not read and pages:
+            result['error'] = next((page['error'] for page in pages if page['error']), None)
+            if all(page.get('rejected') for page in pages):
+                result['rejected'] = pages[0]['rejected']
+        return result
+    
+    def _ocr_strategies(self, graph, result, psm_mode, language, deadline, vocab=False):
+        """Whole-page OCR with each preprocessing strategy; keeps the most confident"""
+        # Try multiple preprocessing strategies if first attempt fails
+        strategies = OCR_STRATEGIES
+        
+        best_text = ""
+        best_confidence = 0
+        custom_config = self.tesseract_config(psm_mode, language, vocab)
+        
+        for index, (strategy_name, node) in enumerate(strategies):
+            # Free what earlier strategies consumed and no later one builds on
+            graph.retain(*(later for _, later in strategies[index:]))
+            # Skip strategies that cannot finish in the remaining budget
+            if deadline and not deadline.allows(self.strategy_costs.get(strategy_name, 0)):
+                OCR_DEADLINE_TOTAL.inc(outcome='skipped')
+                result['partial'] = True
+                continue
             
-            best_text = ""
-            best_confidence = 0
+            strategy_start = time.perf_counter()
+            try:
+                # Apply strategy
+                processed = graph.get(node)
+                
+                # Get OCR data with confidence
+                text, avg_confidence = self._run_tesseract(processed, custom_config, deadline)
+                self._record_strategy_cost(strategy_name, time.perf_counter() - strategy_start)
+                
+                # Update best result
+                if text and avg_confidence > best_confidence:
+                    best_confidence = avg_confidence
+                    best_text = text
+                    result['strategy'] = strategy_name
             
-            for strategy_name, strategy_func in strategies:
+            except Exception as e:
+                if deadline and deadline.expired():
+                    OCR_DEADLINE_TOTAL.inc(outcome='killed')
+                    result['partial'] = True
+                else:
+                    OCR_STRATEGY_ERRORS.inc(strategy=strategy_name)
+                continue
+            finally:
+                OCR_STRATEGY_SECONDS.observe(time.perf_counter() - strategy_start, strategy=strategy_name)
+        graph.retain()
+        
+        # Clean up text
+        if best_text:
+            lines = [line.strip() for line in best_text.split('\n') if line.strip()]
+            result['text'] = ' '.join(lines)
+            result['confidence'] = best_confidence
+    
+    def segment_lines(self, binary, min_line_height=6):
+        """Split a binarized page (dark text on white) into text lines
+        
+        Uses the horizontal projection profile: rows containing ink form
+        runs, and each run is one line. Returns (top, bottom) row ranges
+        padded by a fraction of the line height, in reading order.
+        
+        Noise survives adaptive thresholding as speckle in every row, so
+        the ink mask is despeckled first, and a row counts as ink only
+        above the background level (median + 4 MAD of the emptier half of
+        the rows) and above a tenth of a typical text row.
+        """
+        if not binary.size:
+            return []
+        ink = self._despeckled_profile((binary < 128).astype(np.uint8))
+        background = ink[ink <= np.median(ink)]
+        baseline = np.median(background)
+        mad = np.median(np.abs(background - baseline)) * 1.4826
+        has_ink = ink > max(1, baseline + 4 * mad, np.percentile(ink, 95) * 0.1)
+        # Rising and falling edges of the ink profile
+        edges = np.diff(np.concatenate(([0], has_ink.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        
+        # Merge runs separated by tiny gaps (dots of i/j, accents, ascenders)
+        max_gap = max(2, int(np.median(ends - starts)) // 5) if starts.size else 2
+        runs = []
+        for top, bottom in zip(starts, ends):
+            if runs and top - runs[-1][1] < max_gap:
+                runs[-1][1] = bottom
+            else:
+                runs.append([top, bottom])
+        
+        # A sliver much shorter than a line right next to one (a row of
+        # capitals or ascenders that noise split off) belongs to that line
+        heights = [bottom - top for top, bottom in runs if bottom - top >= min_line_height]
+        sliver = np.median(heights) / 3 if heights else 0
+        merged = []
+        for run in runs:
+            if merged and run[0] - merged[-1][1] < sliver and \
+                    min(run[1] - run[0], merged[-1][1] - merged[-1][0]) < sliver:
+                merged[-1][1] = run[1]
+            else:
+                merged.append(run)
+        
+        height = binary.shape[0]
+        lines = []
+        for top, bottom in merged:
+            if bottom - top < min_line_height:
+                continue
+            pad = max(2, (bottom - top) // 4)
+            lines.append((max(0, int(top) - pad), min(height, int(bottom) + pad)))
+        return lines
+    
+    def _despeckled_profile(self, mask, max_kernel=15):
+        """Ink per row of a 0/1 mask after a morphological open that clears the gaps between lines
+        
+        Speckle grows with the upscaling done before thresholding, so the
+        kernel grows (3, 5, 7, ...) until the emptiest rows hold next to
+        no ink, but stops before a size that also erases most of the text
+        rows (the raw mask is used when even a 3x3 open does).
+        """
+        profile = mask.sum(axis=1).astype(np.float64)
+        for size in range(3, max_kernel + 1, 2):
+            opened = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((size, size), np.uint8))
+            ink = opened.sum(axis=1).astype(np.float64)
+            if not ink.any() or (size > 3 and np.percentile(ink, 95) < np.percentile(profile, 95) / 3):
+                break
+            profile = ink
+            if np.percentile(ink, 10) <= np.percentile(ink, 95) * 0.1:
+                break
+        return profile
+    
+    def _estimate_line_height(self, binary, line_ranges):
+        """Typical band height: the median band when there are enough of them, else twice the text height"""
+        if len(line_ranges) >= 3:
+            return float(np.median([bottom - top for top, bottom in line_ranges]))
+        text_height = self._estimate_text_height(binary)
+        return 2 * text_height if text_height else binary.shape[0]
+    
+    def _ocr_line(self, strip, config, deadline):
+        """OCR one line strip; returns (text, confidence)"""
+        if deadline and deadline.expired():
+            raise RuntimeError('Tesseract process timeout')
+        text, confidence = self._run_tesseract(strip, config, deadline)
+        return ' '.join(line.strip() for line in text.split('\n') if line.strip()), confidence
+    
+    def _ocr_lines(self, graph, result, language, deadline, max_workers=None, vocab=False, on_line=None):
+        """OCR each text line (--psm 7) in parallel and stitch them in reading order
+        
+        Tesseract runs in a subprocess, so a thread pool gives real
+        parallelism across cores. Per-line results are stored in
+        result['lines'] as dicts with text, confidence and box, and passed
+        to on_line as soon as every line above them has been read.
+        
+        A band much taller than a line (several lines the segmentation
+        could not split), or the whole page when no line was found, is read
+        as a block with --psm 6 instead.
+        """
+        binary = graph.get('resized_adaptive')
+        line_ranges = self.segment_lines(binary)
+        line_config = self.tesseract_config(7, language, vocab)
+        block_config = self.tesseract_config(6, language, vocab)
+        if line_ranges:
+            max_band = 2.5 * self._estimate_line_height(binary, line_ranges)
+        else:
+            # No line stood out from the background: read the page as one block
+            line_ranges, max_band = [(0, binary.shape[0])], 0
+        workers = max_workers or self.line_workers
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._ocr_line, binary[top:bottom],
+                                   block_config if bottom - top > max_band else line_config, deadline)
+                       for top, bottom in line_ranges]
+            lines = []
+            for (top, bottom), future in zip(line_ranges, futures):
                 try:
-                    # Apply strategy
-                    if strategy_name == 'original':
-                        processed = img
+                    text, confidence = future.result()
+                except Exception:
+                    if deadline and deadline.expired():
+                        OCR_DEADLINE_TOTAL.inc(outcome='killed')
+                        result['partial'] = True
                     else:
-                        processed = strategy_func(img)
-                    
-                    # Get OCR data with confidence
-                    custom_config = f'--psm {psm_mode} -l {language}'
-                    data = pytesseract.image_to_data(processed, config=custom_config, output_type=pytesseract.Output.DICT)
-                    
-                    # Calculate confidence
-                    confidences = [int(conf) for conf in data['conf'] if conf != '-1']
-                    if confidences:
-                        avg_confidence = sum(confidences) / len(confidences)
-                        
-                        # Extract text
-                        text = ' '.join([data['text'][i] for i in range(len(data['text'])) 
-                                        if data['text'][i].strip()])
-                        
-                        # Update best result
-                        if avg_confidence > best_confidence:
-                            best_confidence = avg_confidence
-                            best_text = text
-                            
-                except Exception as e:
+                        OCR_STRATEGY_ERRORS.inc(strategy='lines')
                     continue
+                if text.strip():
+                    lines.append({'text': text.strip(), 'confidence': confidence,
+                                  'box': (0, top, binary.shape[1], bottom - top)})
+                    if on_line:
+                        on_line(lines[-1])
+        OCR_STRATEGY_SECONDS.observe(time.perf_counter() - start, strategy='lines')
+        
+        result['lines'] = lines
+        result['strategy'] = 'lines'
+        if lines:
+            # Weight each line's confidence by its length
+            total_chars = sum(len(line['text']) for line in lines)
+            result['text'] = ' '.join(line['text'] for line in lines)
+            result['confidence'] = sum(line['confidence'] * len(line['text']) for line in lines) / total_chars
+    
+    def _group_lines(self, data):
+        """Group tesseract words into lines: [{'words', 'confs', 'box'}] in reading order"""
+        lines = {}
+        for i, word in enumerate(data['text']):
+            if not word.strip() or float(data['conf'][i]) < 0:
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            line = lines.setdefault(key, {'words': [], 'confs': [], 'boxes': []})
+            line['words'].append(word.strip())
+            line['confs'].append(float(data['conf'][i]))
+            line['boxes'].append((data['left'][i], data['top'][i], data['width'][i], data['height'][i]))
+        grouped = []
+        for key in sorted(lines):
+            line = lines[key]
+            left = min(b[0] for b in line['boxes'])
+            top = min(b[1] for b in line['boxes'])
+            right = max(b[0] + b[2] for b in line['boxes'])
+            bottom = max(b[1] + b[3] for b in line['boxes'])
+            grouped.append({'words': line['words'], 'confs': line['confs'],
+                            'box': (left, top, right - left, bottom - top)})
+        return grouped
+    
+    def _refine_line(self, gray, box, language, deadline, vocab=False):
+        """Re-OCR one line crop with the aggressive preprocessing path"""
+        x, y, w, h = box
+        pad = max(4, h // 3)
+        crop = gray[max(0, y - pad):y + h + pad, max(0, x - pad):x + w + pad]
+        # Scale the crop so the text is ~target height instead of upscaling the whole page
+        scale = min(4.0, max(1.0, self.target_text_height * 1.5 / max(h, 1)))
+        if scale > 1.0:
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        processed = self._aggressive_filter(crop)
+        text, confidence = self._run_tesseract(processed, self.tesseract_config(7, language, vocab), deadline)
+        return text, confidence, crop.shape[0] * crop.shape[1]
+    
+    def _ocr_refine(self, graph, result, psm_mode, language, deadline, vocab=False):
+        """Cheap whole-page pass, then selective re-OCR of low-confidence lines
+        
+        Word boxes from the first pass locate the weak lines; only those
+        crops go through the expensive preprocessing, and a re-read replaces
+        the original line when it is more confident.
+        """
+        gray = graph.get('gray')
+        
+        start = time.perf_counter()
+        data = self._tesseract_data(gray, self.tesseract_config(psm_mode, language, vocab), deadline)
+        OCR_STRATEGY_SECONDS.observe(time.perf_counter() - start, strategy='refine_base')
+        lines = self._group_lines(data)
+        
+        weak = [line for line in lines if min(line['confs']) < self.refine_threshold]
+        start = time.perf_counter()
+        pixels_refined = 0
+        with ThreadPoolExecutor(max_workers=self.line_workers) as pool:
+            futures = {id(line): pool.submit(self._refine_line, gray, line['box'], language, deadline, vocab)
+                       for line in weak}
+            for line in weak:
+                try:
+                    text, confidence, pixels = futures[id(line)].result()
+                except Exception:
+                    if deadline and deadline.expired():
+                        OCR_DEADLINE_TOTAL.inc(outcome='killed')
+                        result['partial'] = True
+                    else:
+                        OCR_STRATEGY_ERRORS.inc(strategy='refine')
+                    continue
+                pixels_refined += pixels
+                if text.strip() and confidence > sum(line['confs']) / len(line['confs']):
+                    line['words'] = text.split()
+                    line['confs'] = [confidence] * len(line['words'])
+                    line['refined'] = True
+        if weak:
+            OCR_STRATEGY_SECONDS.observe(time.perf_counter() - start, strategy='refine')
+        
+        result['strategy'] = 'refine'
+        result['refined_lines'] = sum(1 for line in lines if line.get('refined'))
+        result['pixels_refined'] = pixels_refined
+        confs = [conf for line in lines for conf in line['confs']]
+        if confs:
+            result['text'] = ' '.join(' '.join(line['words']) for line in lines)
+            result['confidence'] = sum(confs) / len(confs)
+    
+    def _plan_bands(self, gray, text_height):
+        """(gray, upscale, band_height, overlap) for reading gray in bands under the memory ceiling
+        
+        Oversized text is scaled down to about target_text_height first and
+        small text is scaled up 2x per band. The bands overlap by
+        tile_overlap_lines text lines. If not even a band of three overlaps
+        fits next to the decoded image, the image is scaled down until it does.
+        """
+        if text_height and text_height > 2 * self.target_text_height:
+            scale = self.target_text_height / text_height
+            gray = cv2.resize(gray, (max(1, int(gray.shape[1] * scale)), max(1, int(gray.shape[0] * scale))),
+                              interpolation=cv2.INTER_AREA)
+            text_height *= scale
+        upscale = 2.0 if text_height and text_height < self.target_text_height * 0.6 else 1.0
+        
+        while True:
+            height, width = gray.shape
+            line_height = 1.6 * (text_height or self.target_text_height)
+            overlap = max(32, int(self.tile_overlap_lines * line_height))
+            available = self.memory_ceiling - gray.nbytes if self.memory_ceiling else float('inf')
+            band_height = min(height, int(available / (width * self.tile_bytes_per_pixel * upscale ** 2)))
+            if band_height >= min(height, 3 * overlap) or width < 256:
+                return gray, upscale, max(band_height, 3 * overlap), overlap
+            gray = cv2.resize(gray, (int(width * 0.75), int(height * 0.75)), interpolation=cv2.INTER_AREA)
+            text_height = text_height * 0.75 if text_height else None
+    
+    def _ocr_band(self, band, upscale, top, owned, config, deadline, result):
+        """OCR one band with each strategy; returns (words, confidences) of the most confident
+        
+        Only words whose box centre lies in the band's owned rows (image
+        coordinates) are kept; the rest belong to a neighbouring band that
+        holds them whole.
+        """
+        if upscale != 1.0:
+            band = cv2.resize(band, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+        graph = PreprocessGraph(band, self)
+        best = ([], [])
+        best_confidence = 0
+        # 'original' is the grayscale band itself
+        strategies = [strategy for strategy in OCR_STRATEGIES if strategy[0] != 'original']
+        for index, (strategy_name, node) in enumerate(strategies):
+            graph.retain(*(later for _, later in strategies[index:]))
+            if deadline and not deadline.allows(self.strategy_costs.get(f'tile_{strategy_name}', 0)):
+                OCR_DEADLINE_TOTAL.inc(outcome='skipped')
+                result['partial'] = True
+                continue
+            strategy_start = time.perf_counter()
+            try:
+                data = self._tesseract_data(graph.get(node), config, deadline)
+            except Exception:
+                if deadline and deadline.expired():
+                    OCR_DEADLINE_TOTAL.inc(outcome='killed')
+                    result['partial'] = True
+                else:
+                    OCR_STRATEGY_ERRORS.inc(strategy='tiles')
+                continue
+            self._record_strategy_cost(f'tile_{strategy_name}', time.perf_counter() - strategy_start)
+            words, confidences = [], []
+            for i, word in enumerate(data['text']):
+                confidence = float(data['conf'][i])
+                centre = top + (data['top'][i] + data['height'][i] / 2) / upscale
+                if word.strip() and confidence >= 0 and owned[0] <= centre < owned[1]:
+                    words.append(word.strip())
+                    confidences.append(confidence)
+            if words and sum(confidences) / len(confidences) > best_confidence:
+                best_confidence = sum(confidences) / len(confidences)
+                best = (words, confidences)
+        result['preprocess_peak_bytes'] = max(result.get('preprocess_peak_bytes', 0), graph.peak_bytes)
+        return best
+    
+    def _extract_tiled(self, image_path=None, image_bytes=None, psm_mode=6, language='eng',
+                       deadline=None, vocab=None):
+        """OCR a large image band by band within memory_ceiling bytes of image buffers
+        
+        The image is decoded straight to grayscale (one byte per pixel, no
+        RGB/BGR copies) and split into full-width horizontal bands that
+        overlap by a couple of text lines; bands are read one at a time
+        with the grayscale, threshold and adaptive strategies. Each band
+        owns the rows up to the middle of its overlaps, and a word is kept
+        only by the band owning its centre, so a line cut at one band's
+        edge is read whole by its neighbour and the merged text has no
+        duplicates. Unlike the other modes the image is not capped at
+        max_pixels, so small print on huge labels keeps its resolution.
+        The quality gate runs on the full image; deskew and panel cropping
+        (whole-image copies) are skipped.
+        """
+        result = self._new_result()
+        try:
+            gray = self._decode_gray(image_path, image_bytes)
             
-            # Clean up text
-            if best_text:
-                lines = [line.strip() for line in best_text.split('\n') if line.strip()]
-                best_text = ' '.join(lines)
-                return f"{best_text}\n[Confidence: {best_confidence:.1f}%]"
+            if self.quality_gate:
+                quality = self.assess_quality(PreprocessGraph(gray, self))
+                result['quality'] = quality['scores']
+                if not quality['ok']:
+                    result['rejected'] = quality['reason']
+                    OCR_QUALITY_REJECTIONS.inc(reason=quality['reason'])
+                    return result
             
-            return "No text detected"
+            gray, upscale, band_height, overlap = self._plan_bands(gray, self._estimate_text_height(gray))
+            OCR_INPUT_PIXELS.observe(gray.shape[0] * gray.shape[1])
+            height = gray.shape[0]
+            step = max(1, band_height - overlap)
+            tops = list(range(0, max(1, height - overlap), step))
+            config = self.tesseract_config(psm_mode, language, self.use_vocabulary if vocab is None else vocab)
             
+            start = time.perf_counter()
+            words, confidences = [], []
+            for index, top in enumerate(tops):
+                owned = (0 if index == 0 else top + overlap // 2,
+                         height if index == len(tops) - 1 else top + step + overlap // 2)
+                band_words, band_confidences = self._ocr_band(gray[top:top + band_height], upscale, top, owned,
+                                                              config, deadline, result)
+                words.extend(band_words)
+                confidences.extend(band_confidences)
+            OCR_STRATEGY_SECONDS.observe(time.perf_counter() - start, strategy='tiles')
+            OCR_TILES.observe(len(tops))
+            
+            result['strategy'] = 'tiles'
+            result['tiles'] = len(tops)
+            result['preprocess_peak_bytes'] = result.get('preprocess_peak_bytes', 0) + gray.nbytes
+            OCR_PREPROCESS_PEAK_BYTES.observe(result['preprocess_peak_bytes'])
+            if words:
+                result['text'] = ' '.join(words)
+                result['confidence'] = sum(confidences) / len(confidences)
+                OCR_CONFIDENCE.observe(result['confidence'])
+            return result
+        
         except Exception as e:
-            return f"OCR Error: {str(e)}"
+            result['error'] = f"OCR Error: {str(e)}"
+            return result
+    
+    @staticmethod
+    def format_result(result):
+        """Render a result dict as the plain-text form returned by extract_text"""
+        if result['error']:
+            return result['error']
+        if not result['text']:
+            return "No text detected"
+        text = f"{result['text']}\n[Confidence: {result['confidence']:.1f}%]"
+        if result['partial']:
+            text += "\n[Partial result - time budget exceeded]"
+        return text
+    
+    def extract_text(self, image_path=None, image_bytes=None, psm_mode=6, 
+                     language='eng', preprocessing_level='auto', deadline=None, **options):
+        """Enhanced text extraction with multiple strategies"""
+        result = self.extract_text_detailed(image_path=image_path, image_bytes=image_bytes,
+                                            psm_mode=psm_mode, language=language,
+                                            preprocessing_level=preprocessing_level,
+                                            deadline=deadline, **options)
+        return self.format_result(result)
     
     def _simple_threshold(self, img):
         """Simple binary threshold"""
@@ -184,26 +1301,17 @@ if __name__ == "__main__":
     print("Testing Enhanced OCR Engine...")
     
     # Create test images with different qualities
-    from PIL import Image, ImageDraw, ImageFont
-    import numpy as np
+    from ocr.synthetic import make_label_image
     
     # Create test images
     test_images = []
     
     # Clear image
-    img1 = Image.new('RGB', (400, 200), color='white')
-    d = ImageDraw.Draw(img1)
-    d.text((10, 10), "Ingredients:", fill='black')
-    d.text((10, 50), "Water, Sodium Benzoate,", fill='black')
-    d.text((10, 90), "Natural Flavors, Aspartame", fill='black')
-    img1.save("test_ingredients_clear.png")
+    make_label_image().save("test_ingredients_clear.png")
     test_images.append("test_ingredients_clear.png")
     
     # Noisy image (simulate)
-    img2 = np.array(img1)
-    noise = np.random.normal(0, 25, img2.shape).astype(np.uint8)
-    img2 = cv2.add(img2, noise)
-    cv2.imwrite("test_ingredients_noisy.png", cv2.cvtColor(img2, cv2.COLOR_RGB2BGR))
+    make_label_image(noise=25).save("test_ingredients_noisy.png")
     test_images.append("test_ingredients_noisy.png")
     
     # Test batch processing
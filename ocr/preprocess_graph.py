@@ -0,0 +1,98 @@
+import threading
+
+from perf.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+
+
+class PreprocessGraph:
+    """Preprocessing intermediates for one image, each computed at most once
+
+    Nodes form a small DAG rooted at the decoded BGR image:
+
+        decoded -> gray -> threshold
+                        -> adaptive
+                        -> resized -> denoised
+                                   -> resized_adaptive
+                        -> resized_large -> aggressive
+                        -> sharpness (scalar)
+
+    Every strategy and preprocessing level asks the graph for the node it
+    needs, so e.g. the grayscale conversion happens once per request instead
+    of once per strategy. Strategy loops retain() only the nodes their
+    remaining strategies build on, so buffers are freed as they go. The
+    graph also tracks how many bytes of image buffers it holds, and the peak.
+    """
+
+    def __init__(self, image, engine, seed=None):
+        self.engine = engine
+        self._nodes = {}
+        self._lock = threading.RLock()
+        self.bytes_held = 0
+        self.peak_bytes = 0
+        self._store('decoded', image)
+        for name, value in (seed or {}).items():
+            self._store(name, value)
+
+        self._builders = {
+            'gray': ('decoded', self._to_gray),
+            'threshold': ('gray', engine._simple_threshold),
+            'adaptive': ('gray', engine._adaptive_threshold),
+            'resized': ('gray', engine._resize_if_needed),
+            'denoised': ('resized', lambda gray: cv2.fastNlMeansDenoising(gray, h=10)),
+            'resized_adaptive': ('resized', engine._adaptive_threshold),
+            'resized_large': ('gray', lambda gray: engine._resize_if_needed(gray, min_height=1500)),
+            'aggressive': ('resized_large', engine._aggressive_filter),
+            'sharpness': ('gray', engine._sharpness),
+        }
+
+    @staticmethod
+    def _to_gray(image):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+
+    def _store(self, name, value):
+        # A node may be another node unchanged (a grayscale input is its own
+        # 'gray') or a view into one; neither holds new memory
+        shared = any(value is node for node in self._nodes.values())
+        self._nodes[name] = value
+        if not shared and getattr(value, 'base', None) is None:
+            self.bytes_held += getattr(value, 'nbytes', 0)
+            self.peak_bytes = max(self.peak_bytes, self.bytes_held)
+
+    def get(self, name):
+        """Return node `name`, computing it (and its parents) on first use"""
+        with self._lock:
+            if name not in self._nodes:
+                parent, build = self._builders[name]
+                self._store(name, build(self.get(parent)))
+            return self._nodes[name]
+
+    def has(self, name):
+        return name in self._nodes
+
+    def release(self, *names):
+        """Drop intermediates that no later step needs"""
+        with self._lock:
+            for name in names:
+                value = self._nodes.pop(name, None)
+                shared = any(value is node for node in self._nodes.values())
+                if value is not None and not shared and getattr(value, 'base', None) is None:
+                    self.bytes_held -= getattr(value, 'nbytes', 0)
+
+    def retain(self, *names):
+        """Release every node except names and the nodes they are built from"""
+        keep = set()
+        for name in names:
+            while name is not None and name not in keep:
+                keep.add(name)
+                name = self._builders[name][0] if name in self._builders else None
+        with self._lock:
+            self.release(*(name for name in list(self._nodes) if name not in keep))
+
+    def crop(self, box):
+        """Graph for a sub-region, reusing already computed decoded/gray pixels"""
+        x, y, w, h = box
+        seed = {}
+        if self.has('gray') and len(self._nodes['decoded'].shape) == 3:
+            seed['gray'] = self._nodes['gray'][y:y + h, x:x + w]
+        return PreprocessGraph(self._nodes['decoded'][y:y + h, x:x + w], self.engine, seed=seed)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Bulk label scanner: OCR -> extract -> clean -> classify over a directory of images.
+
+Images are processed in a process pool and each result is appended to a
+JSONL file as soon as it finishes. Finished paths are also recorded in a
+checkpoint file, so re-running the same command after a crash skips
+everything already done.
+
+Usage:
+    python -m ocr.scan photos/
+    python -m ocr.scan photos/ --output scan.jsonl --workers 8 --mode refine
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp', 'tiff', 'tif'}
+STAGES = ('ocr', 'nlp', 'ml')
+
+# Set in each worker process by _init_worker
+_options = {}
+
+
+def find_images(root, extensions=IMAGE_EXTENSIONS):
+    """Image paths under root, relative to it, in a stable order"""
+    paths = []
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            if name.rsplit('.', 1)[-1].lower() in extensions:
+                paths.append(os.path.relpath(os.path.join(directory, name), root))
+    return paths
+
+
+def load_checkpoint(checkpoint_path):
+    """Set of relative paths already written to the output"""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def trim_partial_line(output_path):
+    """Drop a half-written last line left by a crash, so the JSONL stays valid"""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+def _init_worker(root, ocr_options, time_budget, verbose):
+    """Per-process setup: one OCR thread per process, quiet pipeline logging"""
+    # The pool already uses every core; nested thread pools would oversubscribe
+    from ocr.ocr_engine import ocr_engine, cv2
+    cv2.setNumThreads(1)
+    ocr_engine.line_workers = 1
+    ocr_engine.page_workers = 1
+    if not verbose:
+        sys.stdout = open(os.devnull, 'w')
+    _options.update(root=root, ocr_options=ocr_options, time_budget=time_budget)
+
+
+def scan_image(relative_path):
+    """Analyze one image; returns a JSON-serializable record (never raises)"""
+    from app.pipeline import analyze_image
+    from perf.deadline import Deadline
+    
+    record = {'path': relative_path}
+    start = time.perf_counter()
+    try:
+        deadline = Deadline(_options['time_budget']) if _options['time_budget'] else None
+        analysis = analyze_image(os.path.join(_options['root'], relative_path),
+                                 deadline=deadline, **_options['ocr_options'])
+        record.update(analysis)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+def scan(root, output_path, checkpoint_path=None, workers=None, chunksize=4,
+         time_budget=None, report_every=100, verbose=False, **ocr_options):
+    """Scan every image under root, appending results to output_path; returns a summary dict"""
+    checkpoint_path = checkpoint_path or output_path + '.checkpoint'
+    workers = workers or os.cpu_count() or 2
+    
+    done = load_checkpoint(checkpoint_path)
+    todo = [path for path in find_images(root) if path not in done]
+    print(f"🔍 {len(todo)} images to scan in {root} ({len(done)} already done), {workers} workers")
+    trim_partial_line(output_path)
+    
+    stage_seconds = dict.fromkeys(STAGES, 0.0)
+    processed = errors = 0
+    start = time.perf_counter()
+    
+    with open(output_path, 'a', encoding='utf-8') as output, \
+            open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            multiprocessing.Pool(workers, initializer=_init_worker,
+                                 initargs=(root, ocr_options, time_budget, verbose)) as pool:
+        for record in pool.imap_unordered(scan_image, todo, chunksize=chunksize):
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+            # The checkpoint only lists paths whose record is already on disk
+            checkpoint.write(record['path'] + '\n')
+            checkpoint.flush()
+            
+            processed += 1
+            errors += bool(record.get('error'))
+            for stage, seconds in record.get('timings', {}).items():
+                stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+            if report_every and processed % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {processed}/{len(todo)} images, {processed / elapsed:.1f} images/sec, {errors} errors")
+    
+    elapsed = time.perf_counter() - start
+    summary = {
+        'images': processed,
+        'errors': errors,
+        'seconds': elapsed,
+        'images_per_sec': processed / elapsed if elapsed else 0.0,
+        # Mean seconds per image, measured inside the workers
+        'stage_seconds': {stage: seconds / processed for stage, seconds in stage_seconds.items()} if processed else {},
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a directory of label images into JSONL")
+    parser.add_argument('directory', help="Directory to scan (recursively)")
+    parser.add_argument('--output', default='scan_results.jsonl', help="JSONL file results are appended to")
+    parser.add_argument('--checkpoint', default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--chunksize', type=int, default=4, help="Images handed to a worker at a time")
+    parser.add_argument('--mode', default='strategies', choices=['strategies', 'lines', 'refine'])
+    parser.add_argument('--time-budget', type=float, default=None, help="Seconds of OCR per image")
+    parser.add_argument('--report-every', type=int, default=100)
+    parser.add_argument('--verbose', action='store_true', help="Keep the pipeline's debug output")
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.directory):
+        sys.exit(f"Not a directory: {args.directory}")
+    
+    summary = scan(args.directory, args.output, args.checkpoint, workers=args.workers,
+                   chunksize=args.chunksize, time_budget=args.time_budget,
+                   report_every=args.report_every, verbose=args.verbose, mode=args.mode)
+    
+    print(f"\n✅ Scanned {summary['images']} images in {summary['seconds']:.1f}s "
+          f"({summary['images_per_sec']:.2f} images/sec), {summary['errors']} errors")
+    for stage, seconds in summary['stage_seconds'].items():
+        print(f"   {stage:>4}: {seconds * 1000:8.1f} ms/image")
+    print(f"   Results: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
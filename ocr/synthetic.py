@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Canned label used for warm-up, benchmarks and load tests
+DEFAULT_LABEL_LINES = [
+    "Ingredients:",
+    "Water, Sodium Benzoate,",
+    "Natural Flavors, Aspartame",
+]
+
+
+def _load_font(font_size):
+    """TrueType font at the requested size, falling back to PIL's bitmap font"""
+    if font_size:
+        for name in ("DejaVuSans.ttf", "arial.ttf", "Arial.ttf"):
+            try:
+                return ImageFont.truetype(name, font_size)
+            except OSError:
+                continue
+    return ImageFont.load_default()
+
+
+def make_label_image(lines=None, size=(400, 200), noise=0, font_size=None, seed=None):
+    """Draw a synthetic ingredient label (RGB PIL image)
+
+    size is (width, height); noise is the standard deviation of Gaussian
+    pixel noise; font_size=None uses PIL's small default font, like the
+    original OCR engine self-test.
+    """
+    lines = lines or DEFAULT_LABEL_LINES
+    width, height = size
+    font = _load_font(font_size)
+
+    image = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(image)
+    line_height = int(font_size * 1.6) if font_size else 40
+    y = 10
+    for line in lines:
+        if y > height - 10:
+            break
+        draw.text((10, y), line, fill='black', font=font)
+        y += line_height
+
+    if noise:
+        rng = np.random.default_rng(seed)
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += rng.normal(0, noise, pixels.shape)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+    return image
+
+
+def make_label_bytes(lines=None, size=(400, 200), noise=0, font_size=None, seed=None, fmt='PNG'):
+    """Same as make_label_image, encoded to bytes (PNG by default)"""
+    buffer = io.BytesIO()
+    make_label_image(lines, size, noise, font_size, seed).save(buffer, format=fmt)
+    return buffer.getvalue()
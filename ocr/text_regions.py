@@ -0,0 +1,68 @@
+from perf.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+
+
+def find_text_blocks(gray, max_side=1024, min_area_ratio=0.002):
+    """Locate paragraph-like text blocks with OpenCV only (no OCR)
+
+    Morphological gradient highlights character strokes, closing with a wide
+    kernel joins characters into lines and a tall kernel joins lines into
+    blocks. Returns (x, y, w, h) boxes in `gray` coordinates, top to bottom.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    small = cv2.resize(gray, (int(width * scale), int(height * scale)),
+                       interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    small_h, small_w = small.shape[:2]
+
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT,
+                                cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+    # Join characters into lines, then lines into paragraphs
+    line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, small_w // 60), 1))
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, line_kernel)
+    # Line spacing is roughly one line height, so close gaps up to that size
+    line_contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    line_heights = sorted(cv2.boundingRect(c)[3] for c in line_contours if cv2.boundingRect(c)[3] >= 3)
+    line_height = line_heights[len(line_heights) // 2] if line_heights else small_h // 80
+    block_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(5, int(line_height * 1.2))))
+    connected = cv2.morphologyEx(connected, cv2.MORPH_CLOSE, block_kernel)
+
+    contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = min_area_ratio * small_w * small_h
+    blocks = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h < min_area or h < 8:
+            continue
+        # Text blocks are partly filled with strokes; solid shapes and empty frames are not
+        fill = cv2.countNonZero(binary[y:y + h, x:x + w]) / float(w * h)
+        if fill < 0.08 or fill > 0.85:
+            continue
+        blocks.append((int(x / scale), int(y / scale), int(w / scale), int(h / scale)))
+
+    return sorted(blocks, key=lambda box: (box[1], box[0]))
+
+
+def select_panel(blocks, keyword_box, image_shape, margin=0.02):
+    """Pick the block holding the ingredient keyword and crop from that line down
+
+    Returns an (x, y, w, h) box clipped to the image, or None if the keyword
+    does not fall inside any block.
+    """
+    kx, ky, kw, kh = keyword_box
+    center_x, center_y = kx + kw / 2, ky + kh / 2
+    height, width = image_shape[:2]
+
+    for x, y, w, h in blocks:
+        if x <= center_x <= x + w and y <= center_y <= y + h:
+            pad_x, pad_y = int(width * margin), int(height * margin)
+            # Text above the keyword line (product name, nutrition table) is dropped
+            top = max(0, ky - pad_y)
+            left = max(0, min(x, kx) - pad_x)
+            right = min(width, max(x + w, kx + kw) + pad_x)
+            bottom = min(height, y + h + pad_y)
+            return left, top, right - left, bottom - top
+    return None
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+from perf.metrics import metrics
+
+CACHE_TOTAL = metrics.counter(
+    'riskread_cache_total', 'Cache lookups by outcome (hit, miss, expired)', ['cache', 'outcome'])
+CACHE_ENTRIES = metrics.gauge(
+    'riskread_cache_entries', 'Entries currently held by a cache', ['cache'])
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds
+    
+    Holds at most max_entries; the least recently used entry is dropped
+    first. max_entries=0 disables the cache (get always misses).
+    """
+    
+    def __init__(self, name, max_entries=1024, ttl=3600, clock=time.monotonic):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()     # key -> (expires_at, value)
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key):
+        """Cached value for key, or None"""
+        if not self.max_entries:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                outcome = 'miss'
+            elif entry[0] <= self._clock():
+                del self._entries[key]
+                outcome = 'expired'
+            else:
+                self._entries.move_to_end(key)
+                outcome = 'hit'
+            CACHE_ENTRIES.set(len(self._entries), cache=self.name)
+        CACHE_TOTAL.inc(cache=self.name, outcome=outcome)
+        return entry[1] if outcome == 'hit' else None
+    
+    def put(self, key, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            CACHE_ENTRIES.set(len(self._entries), cache=self.name)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            CACHE_ENTRIES.set(0, cache=self.name)
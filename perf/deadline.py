@@ -0,0 +1,31 @@
+import time
+
+
+class Deadline:
+    """Absolute point in time by which a piece of work should finish
+
+    Uses the monotonic clock. Pass `None` wherever a deadline is optional to
+    mean "no time limit".
+    """
+
+    def __init__(self, budget_seconds):
+        self.budget = budget_seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_seconds
+
+    def remaining(self):
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def allows(self, estimated_seconds):
+        """True if work expected to take `estimated_seconds` fits in the remaining budget"""
+        return self.remaining() >= estimated_seconds
+
+    def __repr__(self):
+        return f"<Deadline {self.remaining():.2f}s of {self.budget:.2f}s left>"
@@ -0,0 +1,55 @@
+import importlib
+import os
+import threading
+
+# Set RISKREAD_LAZY_IMPORTS=0 to import everything at startup (e.g. to surface
+# missing packages immediately instead of on the first request)
+LAZY_IMPORTS = os.environ.get('RISKREAD_LAZY_IMPORTS', '1') != '0'
+
+
+class LazyModule:
+    """Module proxy that performs the real import on first attribute access"""
+
+    def __init__(self, name, on_load=None):
+        self.__dict__['_name'] = name
+        self.__dict__['_on_load'] = on_load
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    on_load = self.__dict__['_on_load']
+                    if on_load:
+                        on_load(module)
+                    self.__dict__['_module'] = module
+        return module
+
+    @property
+    def is_loaded(self):
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name, on_load=None):
+    """Return a proxy for `name` that is imported on first use"""
+    module = LazyModule(name, on_load=on_load)
+    if not LAZY_IMPORTS:
+        module._load()
+    return module
@@ -0,0 +1,100 @@
+import os
+import resource
+import sys
+import threading
+import time
+
+from perf.metrics import metrics
+
+REQUEST_PEAK_RSS_BYTES = metrics.histogram(
+    'riskread_request_peak_rss_bytes', 'Peak resident memory of the process while a request was running', ['endpoint'],
+    buckets=(64e6, 128e6, 256e6, 512e6, 768e6, 1e9, 1.5e9, 2e9, 4e9, 8e9))
+PROCESS_RSS_BYTES = metrics.gauge(
+    'riskread_process_rss_bytes', 'Resident memory of the process at the last sample')
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss():
+    """Highest resident set size this process has had, in bytes"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class PeakRSSTracker:
+    """Peak process RSS over the lifetime of each tracked request
+
+    RSS belongs to the process, so concurrent requests see each other's
+    memory; the value answers "how big was the worker while this request
+    ran". A sampler thread reads RSS every RISKREAD_RSS_SAMPLE_INTERVAL
+    seconds (default 0.05, 0 disables tracking) while requests are being
+    tracked and sleeps otherwise. Spikes shorter than the interval are
+    still caught when they raise the process high-water mark.
+    """
+
+    def __init__(self, interval=None):
+        if interval is None:
+            interval = float(os.environ.get('RISKREAD_RSS_SAMPLE_INTERVAL', 0.05))
+        self.interval = interval
+        self.enabled = interval > 0 and current_rss() is not None
+        self._active = {}       # token -> [peak seen so far, process high-water mark at start]
+        self._condition = threading.Condition()
+        self._sampler = None
+
+    def start(self):
+        """Begin tracking a request; returns a token for finish() (None when disabled)"""
+        if not self.enabled:
+            return None
+        token = object()
+        entry = [current_rss() or 0, peak_rss()]
+        with self._condition:
+            self._active[token] = entry
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+                self._sampler.start()
+            self._condition.notify()
+        return token
+
+    def finish(self, token):
+        """Stop tracking; returns the peak RSS in bytes seen while the request ran"""
+        with self._condition:
+            peak, high_water_at_start = self._active.pop(token)
+        peak = max(peak, current_rss() or 0)
+        high_water = peak_rss()
+        if high_water > high_water_at_start:
+            # The process reached a new high while this request ran
+            peak = max(peak, high_water)
+        return peak
+
+    def _sample(self):
+        while True:
+            with self._condition:
+                while not self._active:
+                    self._condition.wait()
+            rss = current_rss() or 0
+            PROCESS_RSS_BYTES.set(rss)
+            with self._condition:
+                for entry in self._active.values():
+                    entry[0] = max(entry[0], rss)
+            time.sleep(self.interval)
+
+
+# Create a global instance
+rss_tracker = PeakRSSTracker()
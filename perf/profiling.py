@@ -0,0 +1,189 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+from perf.metrics import metrics
+
+PROFILES_TOTAL = metrics.counter(
+    'riskread_profiles_total', 'Requests that asked to be profiled, by outcome (written, busy)', ['outcome'])
+
+_NOT_PROFILING = nullcontext()
+
+
+class _Stage:
+    """Time and peak memory of one pipeline stage of a profiled request
+
+    The peak is measured above what was already allocated when the stage
+    started, i.e. the extra memory the stage itself needed.
+    """
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.fold_peak()
+        self.peak = 0
+        self.base = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        self.profile.open_stages.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.fold_peak()
+        self.profile.open_stages.remove(self)
+        self.profile.record_stage(self.name, time.perf_counter() - self.start, self.peak - self.base)
+        return False
+
+
+class RequestProfile:
+    """cProfile and tracemalloc state of one profiled request"""
+
+    def __init__(self, profile_id, method, path, endpoint):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint
+        self.stages = {}
+        self.open_stages = []
+        self.peak = 0
+        self.profiler = cProfile.Profile()
+
+    def start(self, frames):
+        tracemalloc.start(frames)
+        self.start_time = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.seconds = time.perf_counter() - self.start_time
+        self.fold_peak()
+        self.snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def fold_peak(self):
+        """Credit the peak since the last fold to the request and every open stage, then reset it"""
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak = max(self.peak, peak)
+        for stage in self.open_stages:
+            stage.peak = max(stage.peak, peak)
+        tracemalloc.reset_peak()
+
+    def record_stage(self, name, seconds, peak):
+        stage = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_memory_kb': 0.0})
+        stage['calls'] += 1
+        stage['seconds'] += seconds
+        stage['peak_memory_kb'] = max(stage['peak_memory_kb'], peak / 1024)
+
+    def report(self, status, top=30):
+        """JSON-serializable summary: stages, hottest functions, retained allocations"""
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = []
+        for function, (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({'function': pstats.func_std_string(function), 'calls': calls,
+                         'total_seconds': round(tottime, 6), 'cumulative_seconds': round(cumtime, 6)})
+        allocations = [{'location': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                       for stat in self.snapshot.statistics('lineno')[:10]]
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'endpoint': self.endpoint,
+            'status': status,
+            'seconds': round(self.seconds, 4),
+            'peak_memory_kb': round(self.peak / 1024, 1),
+            'stages': {name: dict(stage, seconds=round(stage['seconds'], 4),
+                                  peak_memory_kb=round(stage['peak_memory_kb'], 1))
+                       for name, stage in self.stages.items()},
+            'hot_functions': sorted(rows, key=lambda row: row['total_seconds'], reverse=True)[:top],
+            'hot_cumulative': sorted(rows, key=lambda row: row['cumulative_seconds'], reverse=True)[:top],
+            'retained_allocations': allocations,
+        }
+
+
+class Profiler:
+    """Opt-in profiling of single requests under cProfile and tracemalloc
+
+    Off unless RISKREAD_PROFILE_TOKEN is set; a request is then profiled
+    only if it presents that token (X-RiskRead-Profile header or ?profile=
+    query parameter). Each profile is written to RISKREAD_PROFILE_DIR
+    (default 'profiles') as <id>.json (stages, hot functions, allocations)
+    and <id>.prof (pstats, for snakeviz or python -m pstats).
+
+    Only the request's own thread is profiled: work it hands to thread
+    pools shows up as time spent waiting. tracemalloc is process-wide, so
+    one request is profiled at a time; others asking meanwhile run
+    unprofiled.
+    """
+
+    HEADER = 'X-RiskRead-Profile'
+    QUERY_PARAM = 'profile'
+
+    def __init__(self, token=None, directory=None, frames=1):
+        self.token = os.environ.get('RISKREAD_PROFILE_TOKEN', '') if token is None else token
+        self.directory = directory or os.environ.get('RISKREAD_PROFILE_DIR', 'profiles')
+        self.frames = frames
+        self._busy = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return bool(self.token)
+
+    def authorized(self, presented):
+        return self.enabled and bool(presented) and hmac.compare_digest(presented.encode(), self.token.encode())
+
+    def begin(self, method, path, endpoint):
+        """Start profiling this thread's request; returns the RequestProfile, or None if another one is running"""
+        if not self._busy.acquire(blocking=False):
+            PROFILES_TOTAL.inc(outcome='busy')
+            return None
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^a-z0-9_]', '', (endpoint or 'unknown').lower())}" \
+                     f"-{secrets.token_hex(3)}"
+        profile = RequestProfile(profile_id, method, path, endpoint)
+        self._local.profile = profile
+        profile.start(self.frames)
+        return profile
+
+    def end(self, profile, status):
+        """Stop profiling and write the artifacts; returns the report dict"""
+        try:
+            profile.stop()
+        finally:
+            self._local.profile = None
+            self._busy.release()
+        report = profile.report(status)
+        os.makedirs(self.directory, exist_ok=True)
+        profile.profiler.dump_stats(self.path(profile.id, 'prof'))
+        with open(self.path(profile.id, 'json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        PROFILES_TOTAL.inc(outcome='written')
+        print(f"🔬 Profiled {profile.method} {profile.path}: {report['seconds']:.2f}s, "
+              f"peak {report['peak_memory_kb'] / 1024:.1f} MB -> {self.path(profile.id, 'json')}")
+        return report
+
+    def path(self, profile_id, extension):
+        """File of a stored profile; None for ids that are not ours"""
+        if not re.fullmatch(r'[0-9]{8}-[0-9]{6}-[a-z0-9_]*-[0-9a-f]{6}', profile_id):
+            return None
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def stage(self, name):
+        """Context manager around a pipeline stage; a shared no-op unless this thread's request is profiled"""
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            return _NOT_PROFILING
+        return _Stage(profile, name)
+
+
+# Create a global instance
+profiler = Profiler()
@@ -6,18 +6,26 @@ import os
 import sys
 import subprocess
 import webbrowser
+import importlib.util
 from time import sleep
 
 def check_dependencies():
-    """Check if all required packages are installed"""
-    required = ['flask', 'pandas', 'scikit-learn', 'opencv-python', 'pytesseract', 'nltk']
+    """Check if all required packages are installed (without importing them)"""
+    # pip package name -> importable module name
+    required = {
+        'flask': 'flask',
+        'pandas': 'pandas',
+        'scikit-learn': 'sklearn',
+        'opencv-python': 'cv2',
+        'pytesseract': 'pytesseract',
+        'nltk': 'nltk',
+    }
     
     print("Checking dependencies...")
-    for package in required:
-        try:
-            __import__(package.replace('-', '_'))
+    for package, module in required.items():
+        if importlib.util.find_spec(module) is not None:
             print(f"✓ {package}")
-        except ImportError:
+        else:
             print(f"✗ {package} is missing")
             return False
     return True
@@ -86,6 +94,10 @@ def main():
     
     # Start Flask app
     from app.app import app
+    from app.warmup import warm_up
+    
+    # Warm up OCR, NLP, ML and templates before accepting traffic
+    warm_up(app)
     
     # Open browser after delay
     def open_browser():
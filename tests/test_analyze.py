@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+import app.app as webapp
+
+# The last text only yields ingredients through the emergency fallback
+TEXTS = ["Sugar, salt, natural flavors", "Ingredients: water; citric acid", "Ingredients"]
+
+
+def rendered_predictions(client, monkeypatch, text):
+    monkeypatch.setattr(webapp, 'render_template',
+                        lambda template, **context: json.dumps(context.get('predictions')))
+    return json.loads(client.post('/analyze', data={'ingredients': text}).get_data(as_text=True))
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_html_and_json_analyses_agree(text, monkeypatch):
+    client = webapp.app.test_client()
+    webapp.text_result_cache.clear()
+    predictions = rendered_predictions(client, monkeypatch, text)
+    webapp.text_result_cache.clear()
+    result = client.post('/api/analyze', json={'text': text}).get_json()
+    assert predictions and predictions == result['predictions']
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_text_cache_answers_the_same_whichever_endpoint_filled_it(text, monkeypatch):
+    client = webapp.app.test_client()
+    webapp.text_result_cache.clear()
+    fresh = client.post('/api/analyze', json={'text': text}).get_json()
+    assert rendered_predictions(client, monkeypatch, text) == fresh['predictions']
+    reused = client.post('/api/analyze', json={'text': text}).get_json()
+    assert reused['cached'] and reused['ingredients'] == fresh['ingredients']
@@ -0,0 +1,73 @@
+import io
+
+from PIL import Image
+
+from ocr.dedup import DuplicateIndex, fingerprint
+from ocr.synthetic import make_label_bytes, make_label_image
+
+PANEL = [
+    "INGREDIENTS:",
+    "Sugar, wheat flour, palm oil,",
+    "cocoa butter, skim milk powder,",
+    "soy lecithin, salt, natural flavors,",
+    "citric acid, modified corn starch,",
+    "sodium bicarbonate, yellow 5 lake,",
+    "dextrose, red 40.",
+]
+
+
+def panel_bytes(lines):
+    return make_label_bytes(lines, size=(1200, 800), font_size=36)
+
+
+def replace(lines, old, new):
+    return [line.replace(old, new) for line in lines]
+
+
+def tiff_bytes(pages):
+    images = [make_label_image(lines, size=(900, 600), font_size=32) for lines in pages]
+    out = io.BytesIO()
+    images[0].save(out, format='TIFF', save_all=True, append_images=images[1:])
+    return out.getvalue()
+
+
+def new_index():
+    index = DuplicateIndex()
+    index.enabled = True
+    return index
+
+
+def test_labels_differing_by_one_ingredient_are_not_duplicates():
+    index = new_index()
+    index.add(fingerprint(image_bytes=panel_bytes(PANEL)), {'label': 'original'})
+    for changed in (replace(PANEL, "citric acid", "aspartame"), replace(PANEL, "yellow 5", "yellow 6")):
+        assert index.lookup(fingerprint(image_bytes=panel_bytes(changed))) is None
+
+
+def test_documents_sharing_a_cover_page_are_not_duplicates():
+    cover = ["SPEC SHEET", "Product 1042"]
+    a = tiff_bytes([cover, PANEL])
+    b = tiff_bytes([cover, replace(PANEL, "red 40", "red 3")])
+    index = new_index()
+    index.add(fingerprint(image_bytes=a), {'label': 'a'})
+    assert index.lookup(fingerprint(image_bytes=b)) is None
+    assert index.lookup(fingerprint(image_bytes=a)) == {'label': 'a'}
+
+
+def test_same_upload_and_lossless_reencode_are_duplicates():
+    original = panel_bytes(PANEL)
+    reencoded = io.BytesIO()
+    Image.open(io.BytesIO(original)).save(reencoded, format='PNG', compress_level=1)
+    index = new_index()
+    index.add(fingerprint(image_bytes=original), {'label': 'original'})
+    for data in (original, reencoded.getvalue()):
+        assert index.lookup(fingerprint(image_bytes=data)) == {'label': 'original'}
+
+
+def test_entries_from_an_older_classifier_generation_are_not_reused():
+    image_fingerprint = fingerprint(image_bytes=panel_bytes(PANEL))
+    index = new_index()
+    index.add(image_fingerprint, {'label': 'old model'}, generation=0)
+    assert index.lookup(image_fingerprint, generation=1) is None
+    index.add(image_fingerprint, {'label': 'new model'}, generation=1)
+    assert index.lookup(image_fingerprint, generation=1) == {'label': 'new model'}
@@ -0,0 +1,25 @@
+import pytest
+
+from app.app import app
+
+TEXTS = [
+    "sugar; salt",
+    "water\nsugar",
+    "sugar • salt",
+    "Ingredients: water, sugar; salt\nred 40 • citric acid",
+    "salt [sea salt, iodine], sugar",
+]
+
+
+def ingredients_of(predictions):
+    return sorted({prediction['ingredient'].lower() for prediction in predictions})
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_live_and_full_analysis_agree(text):
+    client = app.test_client()
+    full = client.post('/api/analyze', json={'text': text}).get_json()
+    live = client.post('/api/analyze/live', json={'text': text}).get_json()
+    live_predictions = [prediction for segment in live['added'] for prediction in segment['predictions']]
+    assert ingredients_of(live_predictions) == ingredients_of(full['predictions'])
+    assert live['stats'] == full['stats']
@@ -0,0 +1,49 @@
+from PIL import Image
+
+from app.pipeline import analyze_ocr_result
+from ocr.ocr_engine import ocr_engine
+
+PAGES = [
+    "Chocolate Biscuits Net Wt 200g",
+    "Ingredients: wheat flour, sugar, palm oil, cocoa",
+    "butter, skim milk powder, soy lecithin. Nutrition Facts Serving size 30g Calories 150",
+    "Manufactured by Example Foods. Ingredients of the recipe contest: vinegar, garlic",
+    "Storage: keep dry",
+]
+
+
+def write_tiff(path, count):
+    frames = [Image.new('L', (64, 64), 255) for _ in range(count)]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+
+def fake_page(texts):
+    def extract_page(index, frame, options):
+        return dict(ocr_engine._new_result(), text=texts[index], page=index)
+    return extract_page
+
+
+def test_ingredient_section_spans_pages_and_stops_at_end_marker(tmp_path, monkeypatch):
+    path = str(tmp_path / "label.tiff")
+    write_tiff(path, len(PAGES))
+    monkeypatch.setattr(ocr_engine, '_extract_page', fake_page(PAGES))
+
+    ocr_result = ocr_engine.extract_text_detailed(path)
+    ingredients = analyze_ocr_result(ocr_result, 0, verbose=False)['ingredients']
+    assert ocr_result['section'] == ("Ingredients: wheat flour, sugar, palm oil, cocoa "
+                                     "butter, skim milk powder, soy lecithin.")
+    names = [name.lower() for name in ingredients]
+    assert 'cocoa butter' in names and 'skim milk powder' in names
+    assert not any(word in name for name in names for word in ('nutrition', 'vinegar', 'garlic', 'biscuits'))
+
+
+def test_pages_without_heading_are_extracted_one_by_one(tmp_path, monkeypatch):
+    texts = ["sugar, salt", "water, vinegar"]
+    path = str(tmp_path / "label.tiff")
+    write_tiff(path, len(texts))
+    monkeypatch.setattr(ocr_engine, '_extract_page', fake_page(texts))
+
+    ocr_result = ocr_engine.extract_text_detailed(path)
+    ingredients = analyze_ocr_result(ocr_result, 0, verbose=False)['ingredients']
+    assert ocr_result['section'] == ""
+    assert [name.lower() for name in ingredients] == ['sugar', 'salt', 'water', 'vinegar']
@@ -0,0 +1,28 @@
+import pytest
+
+from app.pipeline import canonical_text, extract_ingredients
+
+# Each group has one canonical key, so all its texts must yield the same ingredients
+SAME_KEY = [
+    ["Sugar, Salt", "sugar,  salt", "  SUGAR,\nsalt\t"],
+    ["Made with sugar and salt", "made\nwith sugar  and salt", "MADE   WITH Sugar AND salt"],
+    ["Ingredients: water; sugar", "ingredients:\nwater;   sugar"],
+]
+# Comma placement next to and/or changes what the extractor splits, so these keys must differ
+DIFFERENT_KEYS = [
+    (" , and Salt", "and Salt , "),
+    ("sugar ,and salt", "sugar, and salt"),
+    ("sugar or ,", "sugar or"),
+]
+
+
+@pytest.mark.parametrize('texts', SAME_KEY)
+def test_texts_with_the_same_key_yield_the_same_ingredients(texts):
+    assert len({canonical_text(text) for text in texts}) == 1
+    assert len({tuple(extract_ingredients(text, "text", verbose=False)) for text in texts}) == 1
+
+
+@pytest.mark.parametrize('first, second', DIFFERENT_KEYS)
+def test_comma_placement_around_conjunctions_is_not_folded(first, second):
+    assert extract_ingredients(first, "text", verbose=False) != extract_ingredients(second, "text", verbose=False)
+    assert canonical_text(first) != canonical_text(second)
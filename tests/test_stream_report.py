@@ -0,0 +1,35 @@
+import io
+import json
+
+import app.app as webapp
+from ocr.synthetic import make_label_bytes
+
+
+def fake_stream(image_bytes=None, deadline=None, verbose=True, **ocr_options):
+    prediction = {'ingredient': 'red 40', 'label': 'Harmful', 'explanation': 'Synthetic dye'}
+    yield {'event': 'line', 'text': 'Ingredients: red 40.', 'confidence': 90}
+    yield dict(prediction, event='prediction')
+    ocr_result = {'text': 'Ingredients: red 40.', 'confidence': 90, 'partial': False, 'error': None,
+                  'strategy': 'lines', 'lines': []}
+    yield {'event': 'done', 'ingredients': ['red 40'], 'predictions': [prediction],
+           'stats': webapp.compute_stats([prediction]), 'gibberish': False, 'timings': {'ocr': 0.1},
+           'ocr_result': ocr_result}
+
+
+def test_stream_result_opens_as_report_without_touching_upload_index(monkeypatch):
+    monkeypatch.setattr(webapp, 'stream_image_analysis', fake_stream)
+    monkeypatch.setattr(webapp.upload_index, 'enabled', True)
+    added = []
+    monkeypatch.setattr(webapp.upload_index, 'add', lambda *args: added.append(args))
+    client = webapp.app.test_client()
+
+    image = make_label_bytes(["Ingredients: red 40."], size=(600, 120), font_size=28, seed=7)
+    response = client.post('/analyze/stream', data={'image': (io.BytesIO(image), 'label.png')},
+                           content_type='multipart/form-data')
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [event['event'] for event in events] == ['line', 'prediction', 'done']
+    assert not added
+
+    report = client.get(f"/analyze/result/{events[-1]['result_id']}")
+    assert report.status_code == 200 and b'red 40' in report.data
+    assert client.get('/analyze/result/unknown').status_code == 404